@@ -3,10 +3,16 @@ from flask_login import LoginManager
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 
+from app.cache import ResourceCache, SessionUserCache
+from app.database import RoutingSession, set_sqlite_pragmas, stick_to_primary
+from app.seen import LastSeenBuffer
 from config import config
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 migrate = Migrate()
+resource_cache = ResourceCache()
+session_user_cache = SessionUserCache()
+last_seen_buffer = LastSeenBuffer()
 
 login_manager = LoginManager()
 login_manager.session_protection = "strong"
@@ -19,8 +25,15 @@ def create_app(config_name="default"):
     config[config_name].init_app(app)
 
     db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            set_sqlite_pragmas(engine, app.config["SQLITE_PRAGMAS"])
+    app.after_request(stick_to_primary)
     migrate.init_app(app, db=db)
     login_manager.init_app(app)
+    resource_cache.init_app(app)
+    session_user_cache.init_app(app)
+    last_seen_buffer.init_app(app)
 
     from .main import main as main_blueprint
 
@@ -35,7 +48,9 @@ def create_app(config_name="default"):
     app.register_blueprint(api_blueprint, url_prefix="/api")
 
     from .utils import utils as utils_blueprint
+    from .utils.timing import TimedJSONProvider
 
     app.register_blueprint(utils_blueprint)
+    app.json = TimedJSONProvider(app)
 
     return app
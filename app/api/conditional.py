@@ -0,0 +1,47 @@
+import hashlib
+from collections.abc import Callable, Iterable
+from datetime import UTC, datetime
+from typing import Any
+
+from flask import Response, current_app, make_response, request
+from werkzeug.http import is_resource_modified
+
+from app.models import BaseModel
+
+
+def etag_for(models: Iterable[BaseModel], *extra: str | None) -> str:
+    """Returns a strong ETag for the representation of models.
+
+    It changes with the revision of any model and with the URL root, as the
+    representations contain absolute URLs. Collections pass their next link
+    as extra, so a page changes when its boundaries do. The query string is
+    part of it too, as ?fields= and ?embed= change the representation.
+    """
+    digest = hashlib.blake2b(request.url_root.encode(), digest_size=16)
+    digest.update(request.query_string + b";")
+    for model in models:
+        digest.update(f"{model.__tablename__}:{model.id}:{model.revision};".encode())  # type: ignore
+    for value in extra:
+        digest.update(f"{value};".encode())
+    return digest.hexdigest()
+
+
+def conditional(
+    build: Callable[[], Any], etag: str, last_modified: datetime | None = None
+) -> Response:
+    """Returns the response made of build(), or a 304 if the client's is fresh.
+
+    build is only called when the resource was modified, so a 304 costs
+    neither the serialization nor the queries of the representation.
+    """
+    if last_modified is not None and last_modified.tzinfo is None:
+        # SQLite drops the timezone, all datetimes are stored in UTC
+        last_modified = last_modified.replace(tzinfo=UTC)
+    if is_resource_modified(request.environ, etag, last_modified=last_modified):
+        response = make_response(build())
+    else:
+        response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
@@ -0,0 +1,113 @@
+from collections.abc import Iterator
+from datetime import UTC, datetime
+from typing import Any
+
+from flask import abort, current_app, request
+from sqlalchemy import and_, or_, select
+
+from app import db
+from app.models import Todo, TodoList, User
+
+
+def parse_datetime(value: str) -> datetime:
+    """Parses an ISO 8601 timestamp into a naive UTC datetime, as stored."""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(UTC).replace(tzinfo=None)
+    return parsed
+
+
+def get_since() -> datetime | None:
+    value = request.args.get("since")
+    if value is None:
+        return None
+    try:
+        return parse_datetime(value)
+    except ValueError:
+        abort(400)
+
+
+def isoformat(value: datetime | None) -> str | None:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return value.isoformat()
+
+
+def export_lines(user: User, since: datetime | None = None) -> Iterator[str]:
+    """Yields the NDJSON export of all todolists and todos of user.
+
+    The first line describes the user, its exported_at can be passed as since
+    to a later export to only get what changed in between. Then every
+    todolist is followed by its todos. Everything is read with a single query
+    through a server-side cursor, so memory use does not grow with the
+    number of todos.
+    """
+    dumps = current_app.json.dumps
+    yield (
+        dumps(
+            {
+                "type": "user",
+                "username": user.username,
+                "member_since": isoformat(user.member_since),
+                "exported_at": isoformat(datetime.now(UTC)),
+            }
+        )
+        + "\n"
+    )
+
+    todo_filter = Todo.todolist_id == TodoList.id
+    list_filter = TodoList.creator == user.username
+    if since is not None:
+        todo_filter = and_(todo_filter, Todo.updated_at > since)
+        list_filter = and_(
+            list_filter, or_(TodoList.updated_at > since, Todo.id.is_not(None))
+        )
+    stmt = (
+        select(
+            TodoList.id,
+            TodoList._title,
+            TodoList.created_at,
+            TodoList.updated_at,
+            Todo.id,
+            Todo.description,
+            Todo.created_at,
+            Todo.finished_at,
+            Todo.is_finished,
+            Todo.updated_at,
+        )
+        .outerjoin(Todo, todo_filter)
+        .where(list_filter)
+        .order_by(TodoList.id, Todo.id)
+        .execution_options(yield_per=current_app.config["API_STREAM_CHUNK_SIZE"])
+    )
+    todolist_id = None
+    for rows in db.session.execute(stmt).partitions():
+        lines: list[dict[str, Any]] = []
+        for row in rows:
+            if row[0] != todolist_id:
+                todolist_id = row[0]
+                lines.append(
+                    {
+                        "type": "todolist",
+                        "id": row[0],
+                        "title": row[1],
+                        "created_at": isoformat(row[2]),
+                        "updated_at": isoformat(row[3]),
+                    }
+                )
+            if row[4] is not None:
+                lines.append(
+                    {
+                        "type": "todo",
+                        "id": row[4],
+                        "todolist_id": row[0],
+                        "description": row[5],
+                        "created_at": isoformat(row[6]),
+                        "finished_at": isoformat(row[7]),
+                        "status": "finished" if row[8] else "open",
+                        "updated_at": isoformat(row[9]),
+                    }
+                )
+        yield "".join(dumps(line) + "\n" for line in lines)
@@ -0,0 +1,27 @@
+from flask import abort, request
+
+
+def _get_names_arg(name: str) -> frozenset[str] | None:
+    value = request.args.get(name)
+    if value is None:
+        return None
+    names = frozenset(part.strip() for part in value.split(",") if part.strip())
+    if not names:
+        abort(400)
+    return names
+
+
+def get_fields(model: type) -> frozenset[str] | None:
+    """Returns the fields of model requested by ?fields=, None for all of them."""
+    fields = _get_names_arg("fields")
+    if fields is not None and not fields <= set(model.FIELDS):  # type: ignore
+        abort(400)
+    return fields
+
+
+def get_embed(*allowed: str) -> frozenset[str]:
+    """Returns the related resources requested by ?embed=, out of allowed."""
+    embed = _get_names_arg("embed") or frozenset()
+    if not embed <= set(allowed):
+        abort(400)
+    return embed
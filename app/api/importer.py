@@ -0,0 +1,153 @@
+import json
+from collections.abc import Hashable, Iterable
+from dataclasses import replace
+from datetime import UTC, datetime
+from typing import Any
+
+from flask_sqlalchemy.record_queries import get_recorded_queries
+
+from app.api.export import parse_datetime
+from app.models import Todo, TodoList, transaction
+
+# the report lists the first errors only, an import may have millions of rows
+MAX_REPORTED_ERRORS = 100
+
+
+class Importer:
+    """Imports NDJSON todolists and todos for the user creator.
+
+    Each line is a todolist, {"type": "todolist", "title": ..., "todos": [...]},
+    with its todos nested, or a todo, {"type": "todo", "todolist_id": ...,
+    "description": ...}, referring to the "id" of an earlier todolist line.
+    That way the output of the export can be imported as it is. Rows are
+    validated like the models validate them and inserted chunk_size at a time,
+    each chunk in one multi-row INSERT per table. Invalid rows are skipped and
+    reported by their line number. All chunks are committed together at the
+    end, so an import that fails partway leaves nothing behind.
+    """
+
+    def __init__(self, creator: str, chunk_size: int = 1000) -> None:
+        self.creator = creator
+        self.chunk_size = chunk_size
+        # the ids of the imported todolists by their id in the import
+        self.todolist_ids: dict[Hashable, int | None] = {}
+        self.todolists: list[tuple[Hashable, dict[str, Any]]] = []
+        self.todos: list[tuple[Hashable, dict[str, Any]]] = []
+        self.imported = {"todolists": 0, "todos": 0}
+        self.errors: list[dict[str, Any]] = []
+        self.error_count = 0
+
+    def run(self, lines: Iterable[str | bytes]) -> dict[str, Any]:
+        """Imports all lines, returns the number of rows imported and errors."""
+        with transaction():
+            for number, line in enumerate(lines, 1):
+                if not line.strip():
+                    continue
+                try:
+                    self.add(number, json.loads(line))
+                except ValueError as error:
+                    self.error(number, error)
+            self.flush()
+        return {**self.imported, "errors": self.errors, "error_count": self.error_count}
+
+    def error(self, line: int, error: Exception, todo: int | None = None) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            report: dict[str, Any] = {"line": line, "error": str(error)}
+            if todo is not None:
+                report["todo"] = todo
+            self.errors.append(report)
+
+    def add(self, number: int, item: Any) -> None:
+        if not isinstance(item, dict):
+            raise ValueError(f"{item} is not a todolist or todo")
+        kind = item.get("type", "todolist")
+        if kind == "user":  # the header line of an export
+            return
+        if kind == "todo":
+            self.add_todo(item.get("todolist_id"), item)
+        elif kind == "todolist":
+            self.add_todolist(number, item)
+        else:
+            raise ValueError(f"{kind} is not a valid type")
+
+    def add_todolist(self, number: int, item: dict[str, Any]) -> None:
+        ref = item.get("id", ("line", number))
+        if not isinstance(ref, Hashable):
+            raise ValueError(f"{ref} is not a valid id")
+        if ref in self.todolist_ids:
+            raise ValueError(f"{ref} is the id of an earlier todolist")
+        todos = item.get("todos", [])
+        if not isinstance(todos, list):
+            raise ValueError(f"{todos} are not todos")
+        row = {
+            "title": TodoList.validate_title(item.get("title")),
+            "creator": self.creator,
+            "created_at": timestamp(item, "created_at") or datetime.now(UTC),
+        }
+        self.todolist_ids[ref] = None
+        self.todolists.append((ref, row))
+        for index, todo in enumerate(todos):
+            try:
+                self.add_todo(ref, todo)
+            except ValueError as error:
+                self.error(number, error, todo=index)
+        self.flush_if_full()
+
+    def add_todo(self, ref: Any, item: Any) -> None:
+        if not isinstance(item, dict):
+            raise ValueError(f"{item} is not a todo")
+        if not isinstance(ref, Hashable) or ref not in self.todolist_ids:
+            raise ValueError(f"{ref} is not an imported todolist")
+        status = item.get("status", "open")
+        if status not in ("open", "finished"):
+            raise ValueError(f"{status} is not a valid status")
+        finished_at = timestamp(item, "finished_at")
+        if status == "finished" and finished_at is None:
+            finished_at = datetime.now(UTC)
+        row = {
+            "description": Todo.validate_description(item.get("description")),
+            "creator": self.creator,
+            "created_at": timestamp(item, "created_at") or datetime.now(UTC),
+            "finished_at": finished_at if status == "finished" else None,
+            "is_finished": status == "finished",
+        }
+        self.todos.append((ref, row))
+        self.flush_if_full()
+
+    def flush_if_full(self) -> None:
+        if max(len(self.todolists), len(self.todos)) >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Inserts the pending todolists, then the pending todos."""
+        start = len(get_recorded_queries())
+        self.insert()
+        # the recorded INSERTs would keep every imported row alive through
+        # their parameters; Server-Timing only needs their count and times
+        recorded = get_recorded_queries()
+        recorded[start:] = [replace(query, parameters=()) for query in recorded[start:]]
+
+    def insert(self) -> None:
+        if self.todolists:
+            ids = TodoList.insert_rows([row for _, row in self.todolists])
+            for (ref, _), todolist_id in zip(self.todolists, ids, strict=True):
+                self.todolist_ids[ref] = todolist_id
+            self.imported["todolists"] += len(ids)
+            self.todolists.clear()
+        if self.todos:
+            rows = [
+                {**row, "todolist_id": self.todolist_ids[ref]}
+                for ref, row in self.todos
+            ]
+            self.imported["todos"] += len(Todo.insert_rows(rows))
+            self.todos.clear()
+
+
+def timestamp(item: dict[str, Any], name: str) -> datetime | None:
+    value = item.get(name)
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"{value} is not a valid {name}")
+    return parse_datetime(value)
@@ -0,0 +1,65 @@
+from typing import Any
+
+from flask import abort, current_app, request, url_for
+from sqlalchemy import Select
+from sqlalchemy.orm import InstrumentedAttribute
+
+from app import db
+
+# the largest SQLite INTEGER, larger values can't be bound as parameters
+MAX_INTEGER = 2**63 - 1
+
+
+def _get_positive_int_arg(name: str) -> int | None:
+    value = request.args.get(name)
+    if value is None:
+        return None
+    # isdigit() alone accepts e.g. superscripts, which int() rejects
+    if not (value.isascii() and value.isdigit()) or not 1 <= int(value) <= MAX_INTEGER:
+        abort(400)
+    return int(value)
+
+
+def get_cursor() -> int | None:
+    """Returns the key of the last row the client has already seen, if any."""
+    return _get_positive_int_arg("cursor")
+
+
+def get_page_size() -> int:
+    """Returns the requested page size, bounded by API_MAX_PAGE_SIZE."""
+    limit = _get_positive_int_arg("limit") or current_app.config["API_PAGE_SIZE"]
+    return min(limit, current_app.config["API_MAX_PAGE_SIZE"])
+
+
+def paginate(
+    stmt: Select[Any], key: InstrumentedAttribute[int]
+) -> tuple[list[Any], str | None]:
+    """Returns one page of the rows selected by stmt and the link to the next.
+
+    Pages are seeked by the unique, ascending key instead of an offset, so
+    every page costs the same no matter how deep into the collection it is.
+    The cursor is the key of the last row on the previous page.
+    """
+    limit = get_page_size()
+    cursor = get_cursor()
+    if cursor is not None:
+        stmt = stmt.where(key > cursor)
+    rows = list(db.session.execute(stmt.order_by(key).limit(limit + 1)).scalars())
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    # the other arguments, e.g. fields and embed, carry over to the next page
+    args = {
+        name: values
+        for name, values in request.args.lists()
+        if name not in ("limit", "cursor")
+    }
+    next_url = url_for(
+        request.endpoint or "",
+        **(request.view_args or {}),
+        **args,
+        limit=limit,
+        cursor=getattr(rows[-1], key.key),
+        _external=True,
+    )
+    return rows, next_url
@@ -0,0 +1,103 @@
+import math
+from typing import Any
+
+from flask import abort, request
+from sqlalchemy import func, literal_column, select, tuple_
+
+from app import db
+from app.api.pagination import MAX_INTEGER
+from app.models import Todo, TodoList, search_index
+from app.urls import url_template
+
+
+def parse_query(value: str) -> str:
+    """Turns user input into an FTS5 query matching all of its words.
+
+    Every word is quoted, so FTS5 operators are taken literally, except for
+    a trailing *, which makes the word a prefix, e.g. "groc*".
+    """
+    terms = []
+    for word in value.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if word:
+            terms.append('"' + word.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+def get_search_cursor() -> tuple[float, int] | None:
+    """Returns the score and rowid of the last result already seen, if any."""
+    value = request.args.get("cursor")
+    if value is None:
+        return None
+    score, _, rowid = value.rpartition(":")
+    try:
+        cursor = float(score), int(rowid)
+    except ValueError:
+        abort(400)
+    if not math.isfinite(cursor[0]) or not 0 < cursor[1] <= MAX_INTEGER:
+        abort(400)
+    return cursor
+
+
+def search(
+    query: str,
+    limit: int,
+    cursor: tuple[float, int] | None = None,
+    creator: str | None = None,
+) -> list[tuple[int, float]]:
+    """Returns (rowid, score) of the best matches of query, best first.
+
+    Scores are bm25 ranks, lower is better. Pages are seeked by the score
+    and rowid of the last result of the previous page. With creator only
+    rows of that user's todolists match.
+    """
+    score = func.bm25(literal_column("search_index")).label("score")
+    matches = (
+        select(search_index.c.rowid, search_index.c.todolist_id, score)
+        .where(search_index.c.body.match(query))
+        .subquery()
+    )
+    stmt = select(matches.c.rowid, matches.c.score)
+    if creator is not None:
+        stmt = stmt.join(TodoList, TodoList.id == matches.c.todolist_id).where(
+            TodoList.creator == creator
+        )
+    if cursor is not None:
+        stmt = stmt.where(tuple_(matches.c.score, matches.c.rowid) > tuple_(*cursor))
+    stmt = stmt.order_by(matches.c.score, matches.c.rowid).limit(limit)
+    return [(row[0], row[1]) for row in db.session.execute(stmt)]
+
+
+def _load(model: Any, ids: list[int]) -> dict[int, Any]:
+    if not ids:
+        return {}
+    return {
+        row.id: row
+        for row in db.session.scalars(select(model).where(model.id.in_(ids)))
+    }
+
+
+def load_results(rows: list[tuple[int, float]]) -> list[dict[str, Any]]:
+    """Returns the representations of the todos and todolists of rows.
+
+    Each kind is loaded with one query. Rows deleted in the meantime are
+    left out.
+    """
+    todos = _load(Todo, [rowid // 2 for rowid, _ in rows if rowid % 2 == 0])
+    todolists = _load(TodoList, [rowid // 2 for rowid, _ in rows if rowid % 2 == 1])
+    todo_url = url_template("api.get_todo", "todo_id")
+    todolist_url = url_template("api.get_todolist", "todolist_id")
+    results = []
+    for rowid, score in rows:
+        if rowid % 2 == 0 and (todo := todos.get(rowid // 2)):
+            url = todo_url(todo_id=todo.id)
+            results.append(
+                {"type": "todo", "url": url, "score": score, **todo.to_dict()}
+            )
+        elif rowid % 2 == 1 and (todolist := todolists.get(rowid // 2)):
+            url = todolist_url(todolist_id=todolist.id)
+            results.append(
+                {"type": "todolist", "url": url, "score": score, **todolist.to_dict()}
+            )
+    return results
@@ -0,0 +1,87 @@
+import zlib
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from typing import Any
+
+from flask import Response, current_app, request, stream_with_context
+from sqlalchemy import Select
+from sqlalchemy.orm import InstrumentedAttribute
+
+from app import db
+from app.api.pagination import get_cursor
+
+NDJSON = "application/x-ndjson"
+
+
+def stream_format() -> str | None:
+    """Returns the mimetype to stream the whole collection in, if requested.
+
+    NDJSON is requested through the Accept header, a streamed JSON document
+    with ?stream=1. Otherwise the collection is served page by page.
+    """
+    if request.accept_mimetypes.best_match(["application/json", NDJSON]) == NDJSON:
+        return NDJSON
+    if request.args.get("stream") in ("1", "true"):
+        return "application/json"
+    return None
+
+
+def _gzip(chunks: Iterable[str]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # 31 writes a gzip header
+    for chunk in chunks:
+        if data := compressor.compress(chunk.encode()):
+            yield data
+    yield compressor.flush()
+
+
+def stream(chunks: Iterable[str], mimetype: str) -> Response:
+    """Returns a response streaming chunks, gzipped if the client accepts it.
+
+    chunks is iterated within the request context, after the view returned.
+    """
+    chunks = stream_with_context(chunks)
+    gzipped = request.accept_encodings["gzip"] > 0
+    response = current_app.response_class(
+        _gzip(chunks) if gzipped else chunks, mimetype=mimetype
+    )
+    if gzipped:
+        response.content_encoding = "gzip"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def stream_collection(
+    name: str,
+    stmt: Select[Any],
+    key: InstrumentedAttribute[int],
+    serialize: Callable[[Sequence[Any]], list[dict[str, Any]]],
+) -> Response:
+    """Streams all rows selected by stmt, starting after the cursor if given.
+
+    The rows are read and serialized API_STREAM_CHUNK_SIZE at a time, so memory
+    use is bounded by the chunk size no matter how many rows there are. As JSON
+    the response has the same shape as a last page, {name: [...], "next": null},
+    as NDJSON it has one row per line.
+    """
+    mimetype = stream_format()
+    cursor = get_cursor()
+    if cursor is not None:
+        stmt = stmt.where(key > cursor)
+    stmt = stmt.order_by(key).execution_options(
+        yield_per=current_app.config["API_STREAM_CHUNK_SIZE"]
+    )
+    dumps = current_app.json.dumps
+
+    def generate() -> Iterator[str]:
+        chunks = (serialize(rows) for rows in db.session.scalars(stmt).partitions())
+        if mimetype == NDJSON:
+            for chunk in chunks:
+                yield "".join(dumps(item) + "\n" for item in chunk)
+            return
+        yield f'{{"{name}": ['
+        separator = ""
+        for chunk in chunks:
+            yield separator + ",".join(dumps(item) for item in chunk)
+            separator = ","
+        yield '], "next": null}'
+
+    return stream(generate(), mimetype)
@@ -1,9 +1,17 @@
-from flask import abort, request, url_for
+from flask import abort, current_app, request, url_for
+from flask_login import current_user
 from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 
-from app import db
+from app import db, resource_cache
 from app.api import api
+from app.api.conditional import conditional, etag_for
+from app.api.export import export_lines, get_since
+from app.api.fields import get_embed, get_fields
+from app.api.importer import Importer
+from app.api.pagination import get_page_size, paginate
+from app.api.search import get_search_cursor, load_results, parse_query, search
+from app.api.streaming import NDJSON, stream, stream_collection, stream_format
 from app.decorators import admin_required
 from app.models import Todo, TodoList, User
 
@@ -18,14 +26,25 @@ def get_routes():
 
 @api.route("/users/")
 def get_users():
-    users = db.session.execute(select(User)).scalars().all()
-    return {"users": [user.to_dict() for user in users]}
+    fields = get_fields(User)
+    if stream_format():
+        return stream_collection(
+            "users", select(User), User.id, lambda users: User.to_dicts(users, fields)
+        )
+    users, next_url = paginate(select(User), User.id)
+    return conditional(
+        lambda: {"users": User.to_dicts(users, fields), "next": next_url},
+        etag_for(users, next_url),
+    )
 
 
 @api.route("/user/<string:username>/")
 def get_user(username):
+    fields = get_fields(User)
     user = db.first_or_404(select(User).filter_by(username=username))
-    return user.to_dict()
+    return conditional(
+        lambda: user.to_dict(fields=fields), etag_for([user]), user.updated_at
+    )
 
 
 @api.route("/user/", methods=["POST"])
@@ -46,9 +65,35 @@ def add_user():
 
 @api.route("/user/<string:username>/todolists/")
 def get_user_todolists(username):
+    fields, embed = get_fields(TodoList), get_embed("todos")
     user = db.first_or_404(select(User).filter_by(username=username))
-    todolists = user.todolists
-    return {"todolists": [todolist.to_dict() for todolist in todolists]}
+    todolists, next_url = paginate(
+        select(TodoList).filter_by(creator=user.username), TodoList.id
+    )
+    todos = _embedded_todos(todolists, fields, embed)
+    return conditional(
+        lambda: {
+            "todolists": _todolist_dicts(todolists, fields, todos),
+            "next": next_url,
+        },
+        etag_for([*todolists, *_all_todos(todos)], next_url),
+    )
+
+
+@api.route("/user/<string:username>/export/")
+def export_user(username):
+    user = db.first_or_404(select(User).filter_by(username=username))
+    return stream(export_lines(user, get_since()), NDJSON)
+
+
+@api.route("/user/<string:username>/import/", methods=["POST"])
+def import_user(username):
+    user = db.first_or_404(select(User).filter_by(username=username))
+    importer = Importer(user.username, current_app.config["IMPORT_CHUNK_SIZE"])
+    report = importer.run(request.stream)
+    if not report["todolists"] and not report["todos"]:
+        return {"error": "Bad Request", **report}, 400
+    return report, 201
 
 
 @api.route("/user/<string:username>/todolist/<int:todolist_id>/")
@@ -59,7 +104,7 @@ def get_user_todolist(username, todolist_id):
     todolist = db.get_or_404(TodoList, todolist_id)
     if not user or username != todolist.creator:
         abort(404)
-    return todolist.to_dict()
+    return _todolist_response(todolist)
 
 
 @api.route("/user/<string:username>/todolist/", methods=["POST"])
@@ -77,14 +122,59 @@ def add_user_todolist(username):
 
 @api.route("/todolists/")
 def get_todolists():
-    todolists = db.session.execute(select(TodoList)).scalars().all()
-    return {"todolists": [todolist.to_dict() for todolist in todolists]}
+    fields, embed = get_fields(TodoList), get_embed("todos")
+    if stream_format():
+        return stream_collection(
+            "todolists",
+            select(TodoList),
+            TodoList.id,
+            lambda todolists: _todolist_dicts(
+                todolists, fields, _embedded_todos(todolists, fields, embed)
+            ),
+        )
+    todolists, next_url = paginate(select(TodoList), TodoList.id)
+    todos = _embedded_todos(todolists, fields, embed)
+    return conditional(
+        lambda: {
+            "todolists": _todolist_dicts(todolists, fields, todos),
+            "next": next_url,
+        },
+        etag_for([*todolists, *_all_todos(todos)], next_url),
+    )
 
 
 @api.route("/todolist/<int:todolist_id>/")
 def get_todolist(todolist_id):
     todolist = db.get_or_404(TodoList, todolist_id)
-    return todolist.to_dict()
+    return _todolist_response(todolist)
+
+
+def _embedded_todos(todolists, fields, embed):
+    """Loads the todos of all todolists at once if they are to be embedded."""
+    if "todos" not in embed or (fields is not None and "todos" not in fields):
+        return None
+    return TodoList.load_todos(todolists)
+
+
+def _all_todos(todos):
+    return [todo for group in (todos or {}).values() for todo in group]
+
+
+def _todolist_dicts(todolists, fields, todos):
+    return [
+        todolist.to_dict(fields, None if todos is None else todos[todolist.id])
+        for todolist in todolists
+    ]
+
+
+def _todolist_response(todolist):
+    fields, embed = get_fields(TodoList), get_embed("todos")
+    todos = _embedded_todos([todolist], fields, embed)
+    return conditional(
+        lambda: _todolist_dicts([todolist], fields, todos)[0],
+        etag_for([todolist, *_all_todos(todos)]),
+        todolist.updated_at,
+    )
 
 
 @api.route("/todolist/", methods=["POST"])
@@ -101,16 +191,51 @@ def add_todolist():
 
 @api.route("/todolist/<int:todolist_id>/todos/")
 def get_todolist_todos(todolist_id):
+    fields = get_fields(Todo)
     todolist = db.get_or_404(TodoList, todolist_id)
-    return {"todos": [todo.to_dict() for todo in todolist.todos]}
+    todos, next_url = paginate(select(Todo).filter_by(todolist_id=todolist.id), Todo.id)
+    return conditional(
+        lambda: {"todos": [todo.to_dict(fields) for todo in todos], "next": next_url},
+        etag_for(todos, next_url),
+    )
 
 
 @api.route("/user/<string:username>/todolist/<int:todolist_id>/todos/")
 def get_user_todolist_todos(username, todolist_id):
+    fields = get_fields(Todo)
     todolist = db.get_or_404(TodoList, todolist_id)
     if todolist.creator != username:
         abort(404)
-    return {"todos": [todo.to_dict() for todo in todolist.todos]}
+    todos, next_url = paginate(select(Todo).filter_by(todolist_id=todolist.id), Todo.id)
+    return conditional(
+        lambda: {"todos": [todo.to_dict(fields) for todo in todos], "next": next_url},
+        etag_for(todos, next_url),
+    )
+
+
+def _add_todos(todolist, items, creator=None):
+    """Adds the valid todos of items to todolist in a single transaction.
+
+    Invalid items are skipped and reported by their index in items.
+    """
+    if not items or len(items) > current_app.config["API_MAX_BULK_SIZE"]:
+        abort(400)
+    rows, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError(f"{item} is not a todo")
+            description = Todo.validate_description(item.get("description"))
+        except ValueError as error:
+            errors.append({"index": index, "error": str(error)})
+            continue
+        rows.append(
+            {"description": description, "todolist_id": todolist.id, "creator": creator}
+        )
+    if not rows:
+        return {"error": "Bad Request", "errors": errors}, 400
+    todos = Todo.insert_many(rows)
+    return {"todos": [todo.to_dict() for todo in todos], "errors": errors}, 201
 
 
 @api.route("/user/<string:username>/todolist/<int:todolist_id>/", methods=["POST"])
@@ -122,6 +247,8 @@ def add_user_todolist_todo(username, todolist_id):
     payload = request.get_json(silent=True)
     if payload is None:
         abort(400)
+    if isinstance(payload, list):
+        return _add_todos(todolist, payload, creator=user.username)
     try:
         todo = Todo(
             description=payload.get("description"),
@@ -139,6 +266,8 @@ def add_todolist_todo(todolist_id):
     payload = request.get_json(silent=True)
     if payload is None:
         abort(400)
+    if isinstance(payload, list):
+        return _add_todos(todolist, payload)
     try:
         todo = Todo(
             description=payload.get("description"), todolist_id=todolist.id
@@ -150,8 +279,9 @@ def add_todolist_todo(todolist_id):
 
 @api.route("/todo/<int:todo_id>/")
 def get_todo(todo_id):
+    fields = get_fields(Todo)
     todo = db.get_or_404(Todo, todo_id)
-    return todo.to_dict()
+    return conditional(lambda: todo.to_dict(fields), etag_for([todo]), todo.updated_at)
 
 
 @api.route("/todo/<int:todo_id>/", methods=["PUT"])
@@ -170,6 +300,52 @@ def update_todo_status(todo_id):
     return todo.to_dict()
 
 
+def _update_todos(payload, *criteria):
+    """Applies the is_finished and/or todolist_id of payload to all todos
+    matching criteria, optionally only to those listed in its todo_ids.
+    """
+    if not isinstance(payload, dict):
+        abort(400)
+    is_finished = payload.get("is_finished")
+    todolist_id = payload.get("todolist_id")
+    todo_ids = payload.get("todo_ids")
+    if is_finished is None and todolist_id is None:
+        abort(400)
+    if is_finished is not None and not isinstance(is_finished, bool):
+        abort(400)
+    if todolist_id is not None:
+        if not isinstance(todolist_id, int) or isinstance(todolist_id, bool):
+            abort(400)
+        if db.session.get(TodoList, todolist_id) is None:
+            abort(400)
+    if todo_ids is not None:
+        if (
+            not isinstance(todo_ids, list)
+            or not todo_ids
+            or len(todo_ids) > current_app.config["API_MAX_BULK_SIZE"]
+            or not all(
+                isinstance(id, int) and not isinstance(id, bool) for id in todo_ids
+            )
+        ):
+            abort(400)
+        criteria = (*criteria, Todo.id.in_(todo_ids))
+    if not criteria:
+        abort(400)
+    ids = Todo.update_where(*criteria, is_finished=is_finished, todolist_id=todolist_id)
+    return {"updated": len(ids)}
+
+
+@api.route("/todos/", methods=["PUT"])
+def update_todos():
+    return _update_todos(request.get_json(silent=True))
+
+
+@api.route("/todolist/<int:todolist_id>/todos/", methods=["PUT"])
+def update_todolist_todos(todolist_id):
+    todolist = db.get_or_404(TodoList, todolist_id)
+    return _update_todos(request.get_json(silent=True), Todo.todolist_id == todolist.id)
+
+
 @api.route("/todolist/<int:todolist_id>/", methods=["PUT"])
 def change_todolist_title(todolist_id):
     todolist = db.get_or_404(TodoList, todolist_id)
@@ -184,6 +360,43 @@ def change_todolist_title(todolist_id):
     return todolist.to_dict()
 
 
+@api.route("/search/")
+def search_todos():
+    text = request.args.get("q", "")
+    query = parse_query(text)
+    if not query:
+        abort(400)
+    mine = request.args.get("mine") in ("1", "true")
+    if mine and not current_user.is_authenticated:
+        abort(401)
+    limit = get_page_size()
+    rows = search(
+        query,
+        limit + 1,
+        get_search_cursor(),
+        creator=current_user.username if mine else None,
+    )
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        rowid, score = rows[-1]
+        next_url = url_for(
+            "api.search_todos",
+            q=text,
+            mine=request.args.get("mine"),
+            limit=limit,
+            cursor=f"{score!r}:{rowid}",
+            _external=True,
+        )
+    return {"results": load_results(rows), "next": next_url}
+
+
+@api.route("/cache/")
+@admin_required
+def get_cache_stats():
+    return resource_cache.stats()
+
+
 @api.route("/user/<string:username>/", methods=["DELETE"])
 @admin_required
 def delete_user(username):
@@ -0,0 +1,218 @@
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any, Protocol
+
+from flask import Flask, current_app, has_request_context, request
+from werkzeug.utils import import_string
+
+
+class CacheBackend(Protocol):
+    """Storage of a ResourceCache, values are dicts keyed by URL root."""
+
+    def get(self, key: Hashable) -> dict[str, Any] | None: ...
+
+    def set(self, key: Hashable, value: dict[str, Any]) -> None: ...
+
+    def delete(self, key: Hashable) -> None: ...
+
+    def clear(self) -> None: ...
+
+    def stats(self) -> dict[str, int]: ...
+
+
+class NullBackend:
+    """Caches nothing, every lookup is a miss."""
+
+    def __init__(self, maxsize: int = 0, ttl: float = 0) -> None:
+        pass
+
+    def get(self, key: Hashable) -> dict[str, Any] | None:
+        return None
+
+    def set(self, key: Hashable, value: dict[str, Any]) -> None:
+        pass
+
+    def delete(self, key: Hashable) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    def stats(self) -> dict[str, int]:
+        return {"evictions": 0, "size": 0}
+
+
+class LRUBackend:
+    """An in-process cache of at most maxsize entries, each kept for ttl seconds.
+
+    When full, the least recently used entry is evicted. It is shared by all
+    threads of a process, but not between processes.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: OrderedDict[Hashable, tuple[float, dict[str, Any]]] = (
+            OrderedDict()
+        )
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> dict[str, Any] | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: Hashable, value: dict[str, Any]) -> None:
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self.lock:
+            return {"evictions": self.evictions, "size": len(self.entries)}
+
+
+BACKENDS = {"lru": LRUBackend, "null": NullBackend}
+
+
+class SessionUserCache:
+    """Caches what current_user needs of a user by its id, see load_user.
+
+    Entries live for SESSION_USER_CACHE_TTL seconds at most, 0 disables the
+    cache. As it is per process, a change made through another process is
+    seen after that long, e.g. a deleted user stays logged in until then.
+    """
+
+    def init_app(self, app: Flask) -> None:
+        ttl = app.config["SESSION_USER_CACHE_TTL"]
+        backend_class = LRUBackend if ttl > 0 else NullBackend
+        app.extensions["session_user_cache"] = backend_class(
+            maxsize=app.config["SESSION_USER_CACHE_SIZE"], ttl=ttl
+        )
+
+    @property
+    def backend(self) -> CacheBackend:
+        return current_app.extensions["session_user_cache"]
+
+    def get(self, user_id: int) -> dict[str, Any] | None:
+        return self.backend.get(user_id)
+
+    def set(self, user_id: int, value: dict[str, Any]) -> None:
+        self.backend.set(user_id, value)
+
+    def invalidate(self, *user_ids: int) -> None:
+        for user_id in user_ids:
+            self.backend.delete(user_id)
+
+
+class ResourceCache:
+    """Caches the serialized representations (to_dict) of models.
+
+    Entries are keyed by the model's table and id and hold the revision of
+    the row they were built from. An entry of another revision is a miss, so
+    once a row changed, or its id was reused, no process serves the old
+    representation, even if only the process that wrote dropped its entry. As representations contain
+    absolute URLs, each entry holds one representation per URL root. The
+    backend is set by RESOURCE_CACHE_BACKEND, either one of BACKENDS or the
+    import path of a class implementing CacheBackend.
+    """
+
+    def __init__(self) -> None:
+        # guards the hit and miss counters, requests may run in threads
+        self.stats_lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        backend = app.config["RESOURCE_CACHE_BACKEND"]
+        backend_class = BACKENDS.get(backend) or import_string(backend)
+        app.extensions["resource_cache"] = backend_class(
+            maxsize=app.config["RESOURCE_CACHE_SIZE"],
+            ttl=app.config["RESOURCE_CACHE_TTL"],
+        )
+        app.extensions["resource_cache_stats"] = dict(hits=0, misses=0)
+
+    @property
+    def backend(self) -> CacheBackend:
+        return current_app.extensions["resource_cache"]
+
+    @staticmethod
+    def _url_root() -> str:
+        return request.url_root if has_request_context() else ""
+
+    def _representations(
+        self, table: str, ident: Hashable, revision: str
+    ) -> dict[str, Any]:
+        entry = self.backend.get((table, ident))
+        if entry is None or entry["revision"] != revision:
+            return {}
+        return entry["representations"]
+
+    def get(self, table: str, ident: Hashable, revision: str) -> dict[str, Any] | None:
+        value = self._representations(table, ident, revision).get(self._url_root())
+        stats = current_app.extensions["resource_cache_stats"]
+        with self.stats_lock:
+            stats["misses" if value is None else "hits"] += 1
+        return value
+
+    def contains(self, table: str, ident: Hashable, revision: str) -> bool:
+        """Whether a representation is cached, without counting a hit or miss."""
+        return self._url_root() in self._representations(table, ident, revision)
+
+    def set(
+        self, table: str, ident: Hashable, revision: str, value: dict[str, Any]
+    ) -> None:
+        representations = self._representations(table, ident, revision)
+        self.backend.set(
+            (table, ident),
+            {
+                "revision": revision,
+                "representations": {**representations, self._url_root(): value},
+            },
+        )
+
+    def cached(
+        self,
+        table: str,
+        ident: Hashable,
+        revision: str,
+        build: Callable[[], dict[str, Any]],
+    ) -> dict[str, Any]:
+        """Returns the cached representation, or builds and caches it."""
+        value = self.get(table, ident, revision)
+        if value is None:
+            value = build()
+            self.set(table, ident, revision, value)
+        return dict(value)
+
+    def invalidate(self, table: str, *idents: Hashable) -> None:
+        for ident in idents:
+            self.backend.delete((table, ident))
+
+    def clear(self) -> None:
+        self.backend.clear()
+        with self.stats_lock:
+            current_app.extensions["resource_cache_stats"].update(hits=0, misses=0)
+
+    def stats(self) -> dict[str, int]:
+        with self.stats_lock:
+            counts = dict(current_app.extensions["resource_cache_stats"])
+        return {**counts, **self.backend.stats()}
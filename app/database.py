@@ -0,0 +1,80 @@
+from collections.abc import Mapping
+from typing import Any
+
+from flask import Response, current_app, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Engine, Select, event
+
+# the bind key of the read replica in SQLALCHEMY_BINDS
+REPLICA = "replica"
+# set in the WSGI environment once a request has written
+PRIMARY_KEY = "todolist.primary"
+# tells later requests of the same client to read from the primary
+PRIMARY_COOKIE = "primary"
+
+
+def set_sqlite_pragmas(engine: Engine, pragmas: Mapping[str, Any]) -> None:
+    """Runs PRAGMA name = value for each of pragmas on every new connection.
+
+    Does nothing for other databases than SQLite. Pragmas are per
+    connection, except journal_mode=WAL, which sticks to the database file.
+    """
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+
+class RoutingSession(Session):
+    """Sends the reads of GET requests to the replica bind, if configured.
+
+    Everything else goes to the primary: writes, reads outside of GET
+    requests and reads after the request wrote, so a request always sees
+    its own changes. Its client keeps reading from the primary for
+    REPLICA_STICKY_SECONDS, through a cookie, so that e.g. the page it is
+    redirected to after a POST doesn't miss the change either.
+    """
+
+    def get_bind(
+        self,
+        mapper: Any | None = None,
+        clause: Any | None = None,
+        bind: Any | None = None,
+        **kwargs: Any,
+    ) -> Any:
+        if bind is None and has_request_context():
+            if self._flushing or not isinstance(clause, Select):
+                request.environ[PRIMARY_KEY] = True
+            elif reads_from_replica():
+                return self._db.engines[REPLICA]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def reads_from_replica() -> bool:
+    return (
+        request.method in ("GET", "HEAD")
+        and REPLICA in current_app.config["SQLALCHEMY_BINDS"]
+        and not request.environ.get(PRIMARY_KEY)
+        and PRIMARY_COOKIE not in request.cookies
+    )
+
+
+def stick_to_primary(response: Response) -> Response:
+    """Sets the cookie keeping a client on the primary after it wrote."""
+    if (
+        request.environ.get(PRIMARY_KEY)
+        and REPLICA in current_app.config["SQLALCHEMY_BINDS"]
+    ):
+        response.set_cookie(
+            PRIMARY_COOKIE,
+            "1",
+            max_age=current_app.config["REPLICA_STICKY_SECONDS"],
+            httponly=True,
+            samesite="Lax",
+        )
+    return response
@@ -1,10 +1,11 @@
 from flask import redirect, render_template, request, url_for
 from flask_login import current_user, login_required
+from sqlalchemy import select
 
 from app import db
 from app.main import main
 from app.main.forms import TodoForm, TodoListForm
-from app.models import Todo, TodoList
+from app.models import Todo, TodoList, transaction
 
 
 @main.route("/")
@@ -21,7 +22,10 @@ def todolist_overview():
     form = TodoListForm()
     if form.validate_on_submit():
         return redirect(url_for("main.add_todolist"))
-    return render_template("overview.html", form=form)
+    todolists = db.session.scalars(
+        select(TodoList).filter_by(creator=current_user.username).order_by(TodoList.id)
+    )
+    return render_template("overview.html", form=form, todolists=todolists)
 
 
 def _get_user():
@@ -42,6 +46,7 @@ def todolist(id):
 
 
 @main.route("/todolist/new/", methods=["POST"])
+@transaction()
 def new_todolist():
     form = TodoForm(todo=request.form.get("todo"))
     if form.validate():
@@ -1,17 +1,46 @@
 from __future__ import annotations
 
 import re
-from collections.abc import Mapping, Sized
+from collections import Counter
+from collections.abc import Collection, Iterable, Iterator, Mapping, Sequence, Sized
+from contextlib import contextmanager
 from datetime import UTC, datetime
-from typing import Any, Self
+from typing import Any, ClassVar, Self
 
-from flask import url_for
 from flask_login import UserMixin
-from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, String
+from sqlalchemy import (
+    DDL,
+    Boolean,
+    ColumnElement,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    ScalarSelect,
+    String,
+    case,
+    column,
+    event,
+    func,
+    insert,
+    inspect,
+    or_,
+    select,
+    update,
+)
 from sqlalchemy.orm import DynamicMapped, Mapped, mapped_column, relationship, synonym
-from werkzeug.security import check_password_hash, generate_password_hash
-
-from app import db, login_manager
+from sqlalchemy.sql.expression import TableClause
+from werkzeug.security import check_password_hash
+
+from app import (
+    db,
+    last_seen_buffer,
+    login_manager,
+    resource_cache,
+    session_user_cache,
+)
+from app.passwords import hash_password, needs_rehash
+from app.urls import url_template
 
 EMAIL_REGEX = re.compile(r"^\S+@\S+\.\S+$")
 USERNAME_REGEX = re.compile(r"^\S+$")
@@ -22,37 +51,238 @@ def check_length(attribute: object, length: int) -> bool:
     return bool(attribute) and isinstance(attribute, Sized) and len(attribute) <= length
 
 
+@contextmanager
+def transaction() -> Iterator[None]:
+    """Runs the enclosed saves and deletes in a single transaction.
+
+    Within the block save() and delete() only flush their changes. Everything
+    is committed at the end of the block, or rolled back if it raises. Nested
+    blocks join the outermost one. Can be used as a decorator, e.g. on views.
+    """
+    depth = db.session.info.get("transaction_depth", 0)
+    db.session.info["transaction_depth"] = depth + 1
+    try:
+        yield
+        if depth == 0:
+            db.session.commit()
+    except BaseException:
+        if depth == 0:
+            db.session.rollback()
+        raise
+    finally:
+        db.session.info["transaction_depth"] = depth
+
+
+def select_fields(
+    representation: dict[str, Any], fields: Collection[str] | None
+) -> dict[str, Any]:
+    """Returns the representation with only the given fields, all if None."""
+    if fields is None:
+        return representation
+    return {name: value for name, value in representation.items() if name in fields}
+
+
+def invalidate_cached(table: str, *idents: Any) -> None:
+    """Drops the cached representations of the given rows.
+
+    They are dropped again when the transaction ends, in case a representation
+    of the uncommitted rows was cached in the meantime.
+    """
+    resource_cache.invalidate(table, *idents)
+    db.session.info.setdefault("invalidated", set()).update(
+        (table, ident) for ident in idents
+    )
+
+
+def invalidate_session_user(user_id: int) -> None:
+    """Drops the cached current_user of a user, now and at the transaction's end."""
+    session_user_cache.invalidate(user_id)
+    db.session.info.setdefault("invalidated_session_users", set()).add(user_id)
+
+
+@event.listens_for(db.session, "after_flush")
+def _invalidate_inserted(session: Any, flush_context: Any) -> None:
+    # a reused id may still have the deleted row's representation cached
+    for model in session.new:
+        if isinstance(model, BaseModel):
+            invalidate_cached(model.__tablename__, model.cache_ident)  # type: ignore
+
+
+@event.listens_for(db.session, "after_commit")
+@event.listens_for(db.session, "after_soft_rollback")
+def _invalidate_after_transaction(session: Any, *args: Any) -> None:
+    for table, ident in session.info.pop("invalidated", ()):
+        resource_cache.invalidate(table, ident)
+    session_user_cache.invalidate(*session.info.pop("invalidated_session_users", ()))
+
+
 class BaseModel:
-    """Base for all models, providing save, delete and from_dict methods."""
+    """Base for all models, providing save, delete and from_dict methods.
+
+    Every row carries a version and updated_at, which are bumped on each
+    change. The API derives its ETag and Last-Modified headers from them.
+    """
+
+    version: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
+    updated_at: Mapped[datetime | None] = mapped_column(
+        DateTime, default=lambda: datetime.now(UTC)
+    )
 
-    def __commit(self) -> None:
-        """Commits the current db.session, does rollback on failure."""
+    @staticmethod
+    def __commit() -> None:
+        """Commits the current db.session, does rollback on failure.
+
+        Inside of a transaction() block the session is only flushed.
+        """
         from sqlalchemy.exc import IntegrityError
 
+        if db.session.info.get("transaction_depth"):
+            db.session.flush()
+            return
         try:
             db.session.commit()
         except IntegrityError:
             db.session.rollback()
             raise
 
+    @property
+    def revision(self) -> str:
+        """Identifies this state of the row, for the resource_cache and ETags.
+
+        The version alone doesn't do: SQLite reuses the id of a deleted row,
+        and the new row starts at version 1 again. Its updated_at differs.
+        """
+        updated_at = self.updated_at
+        if updated_at is not None and updated_at.tzinfo is not None:
+            updated_at = updated_at.astimezone(UTC).replace(tzinfo=None)
+        return f"{self.version}:{updated_at.isoformat() if updated_at else ''}"
+
+    @property
+    def cache_ident(self) -> Any:
+        """Identifies this model's entry in the resource_cache."""
+        return self.id  # type: ignore
+
+    @classmethod
+    def cache_ident_column(cls) -> Any:
+        """The column holding cache_ident, for rows changed in bulk."""
+        return cls.id  # type: ignore
+
     def delete(self) -> None:
         """Deletes this model from the db (through db.session)"""
+        invalidate_cached(self.__tablename__, self.cache_ident)  # type: ignore
         db.session.delete(self)
         self.__commit()
 
     def save(self) -> Self:
         """Adds this model to the db (through db.session)"""
+        if inspect(self).has_identity and db.session.is_modified(self):
+            self.touch()
+            invalidate_cached(self.__tablename__, self.cache_ident)  # type: ignore
         db.session.add(self)
         self.__commit()
         return self
 
+    def touch(self) -> None:
+        """Marks this model as changed, bumping its version and updated_at."""
+        self.version = type(self).version + 1  # type: ignore
+        self.updated_at = datetime.now(UTC)
+
+    @classmethod
+    def touch_where(cls, *criteria: ColumnElement[bool]) -> None:
+        """Marks all rows matching criteria as changed, within the transaction.
+
+        Used when a change to one row alters the representation of another,
+        e.g. a new todolist changes the todolist_count of its creator.
+        """
+        db.session.execute(
+            update(cls)
+            .where(*criteria)
+            .values(version=cls.version + 1, updated_at=datetime.now(UTC))
+        )
+
     @classmethod
     def from_dict(cls, model_dict: Mapping[str, Any]) -> Self:
         return cls(**dict(model_dict)).save()
 
+    @classmethod
+    def insert_rows(cls, rows: Sequence[Mapping[str, Any]]) -> list[int]:
+        """Adds all rows to the db with one multi-row INSERT and one commit.
+
+        Returns the ids of the rows in the given order, without loading any
+        model. The rows bypass __init__, so they have to be validated
+        beforehand.
+        """
+        if not rows:
+            return []
+        # e.g. title is a synonym for the _title column attribute
+        synonyms = {name: prop.name for name, prop in inspect(cls).synonyms.items()}
+        rows = [
+            {synonyms.get(key, key): value for key, value in row.items()}
+            for row in rows
+        ]
+        # RETURNING need not return the rows in the order of the VALUES.
+        # sort_by_parameter_order makes SQLite insert row by row though, and
+        # there the ids of one INSERT ascend in the order of its VALUES.
+        # render_nulls keeps rows with None values in the same batch.
+        sqlite = db.session.get_bind(cls).dialect.name == "sqlite"
+        stmt = (
+            insert(cls)  # type: ignore
+            .returning(
+                cls.id,  # type: ignore
+                cls.cache_ident_column(),
+                sort_by_parameter_order=not sqlite,
+            )
+            .execution_options(render_nulls=True)
+        )
+        inserted = db.session.execute(stmt, rows).all()
+        if sqlite:
+            inserted.sort()
+        # a reused id may still have the deleted row's representation cached
+        invalidate_cached(cls.__tablename__, *(row[1] for row in inserted))  # type: ignore
+        cls.__commit()
+        return [row[0] for row in inserted]
+
+    @classmethod
+    def update_rows(
+        cls, criteria: Sequence[ColumnElement[bool]], values: Mapping[str, Any]
+    ) -> list[int]:
+        """Updates all rows matching criteria with one UPDATE and one commit.
+
+        Bumps the version of each updated row and returns their ids. Like
+        insert_rows() the values bypass the models, so they have to be
+        validated beforehand.
+        """
+        rows = db.session.execute(
+            update(cls)  # type: ignore
+            .where(*criteria)
+            .values(**values, version=cls.version + 1, updated_at=datetime.now(UTC))
+            .returning(cls.id, cls.cache_ident_column())  # type: ignore
+        ).all()
+        invalidate_cached(cls.__tablename__, *(row[1] for row in rows))  # type: ignore
+        cls.__commit()
+        return [row[0] for row in rows]
+
+    @classmethod
+    def insert_many(cls, rows: Sequence[Mapping[str, Any]]) -> list[Self]:
+        """Same as insert_rows(), but returns the models, loaded in one query."""
+        ids = cls.insert_rows(rows)
+        if not ids:
+            return []
+        stmt = select(cls).where(cls.id.in_(ids))  # type: ignore
+        models = {model.id: model for model in db.session.scalars(stmt)}  # type: ignore
+        return [models[id] for id in ids]
+
 
 class User(UserMixin, db.Model, BaseModel):  # type: ignore
     __tablename__ = "user"
+    FIELDS: ClassVar[tuple[str, ...]] = (
+        "username",
+        "user_url",
+        "member_since",
+        "last_seen",
+        "todolists",
+        "todolist_count",
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     _username: Mapped[str | None] = mapped_column("username", String(64), unique=True)
     _email: Mapped[str | None] = mapped_column("email", String(64), unique=True)
@@ -61,7 +291,7 @@ class User(UserMixin, db.Model, BaseModel):  # type: ignore
         DateTime, default=lambda: datetime.now(UTC)
     )
     last_seen: Mapped[datetime | None] = mapped_column(
-        DateTime, default=lambda: datetime.now(UTC)
+        DateTime, index=True, default=lambda: datetime.now(UTC)
     )
     is_admin: Mapped[bool] = mapped_column(Boolean, default=False)
 
@@ -117,50 +347,186 @@ class User(UserMixin, db.Model, BaseModel):  # type: ignore
         if not bool(password):
             raise ValueError("no password given")
 
-        hashed_password = generate_password_hash(password)
+        hashed_password = hash_password(password)
         if len(hashed_password) > 256:
             raise ValueError("not a valid password, hash is too long")
         self.password_hash = hashed_password
 
     def verify_password(self, password: str) -> bool:
+        """Checks password, rehashing it if PASSWORD_HASH_METHOD has changed.
+
+        Only a successful check can rehash, as that is the only time the
+        plain password is known. The new hash is saved right away.
+        """
         if not self.password_hash:
             return False
-        return check_password_hash(self.password_hash, password)
+        if not check_password_hash(self.password_hash, password):
+            return False
+        if needs_rehash(self.password_hash):
+            self.password = password
+            self.save()
+        return True
+
+    @property
+    def cache_ident(self) -> str:
+        return self.username
+
+    @classmethod
+    def cache_ident_column(cls) -> Any:
+        return cls._username
+
+    def save(self) -> Self:
+        if inspect(self).has_identity:
+            invalidate_session_user(self.id)
+        return super().save()
+
+    def delete(self) -> None:
+        if inspect(self).has_identity:
+            invalidate_session_user(self.id)
+        super().delete()
+
+    @staticmethod
+    def touch_usernames(*usernames: str) -> None:
+        """Marks the users as changed, e.g. when their todolist_count changes."""
+        User.touch_where(User._username.in_(usernames))
+        invalidate_cached(User.__tablename__, *usernames)
 
     def seen(self) -> Self:
-        self.last_seen = datetime.now(UTC)
-        return self.save()
+        """Records that the user was seen now, see app.seen.LastSeenBuffer."""
+        last_seen_buffer.record(self)
+        return self
 
-    def to_dict(self) -> dict[str, Any]:
-        return {
+    @staticmethod
+    def count_todolists(users: Iterable[User]) -> dict[str, int]:
+        """Counts the todolists of all given users in a single query."""
+        usernames = [user.username for user in users]
+        if not usernames:
+            return {}
+        stmt = (
+            select(TodoList.creator, func.count(TodoList.id))
+            .where(TodoList.creator.in_(usernames))
+            .group_by(TodoList.creator)
+        )
+        counts = {username: 0 for username in usernames}
+        counts.update({row[0]: row[1] for row in db.session.execute(stmt)})
+        return counts
+
+    def _representation(self, todolist_count: int | None) -> dict[str, Any]:
+        representation = {
             "username": self.username,
-            "user_url": url_for("api.get_user", username=self.username, _external=True),
+            "user_url": url_template("api.get_user", "username")(
+                username=self.username
+            ),
             "member_since": self.member_since,
             "last_seen": self.last_seen,
-            "todolists": url_for(
-                "api.get_user_todolists", username=self.username, _external=True
+            "todolists": url_template("api.get_user_todolists", "username")(
+                username=self.username
             ),
-            "todolist_count": self.todolists.count(),
         }
+        if todolist_count is not None:
+            representation["todolist_count"] = todolist_count
+        return representation
+
+    def to_dict(
+        self,
+        todolist_count: int | None = None,
+        fields: Collection[str] | None = None,
+    ) -> dict[str, Any]:
+        if fields is not None and "todolist_count" not in fields:
+            # no need to count the todolists, but use the full one if cached
+            representation = resource_cache.get(
+                self.__tablename__, self.username, self.revision
+            )
+            return select_fields(representation or self._representation(None), fields)
+
+        def build() -> dict[str, Any]:
+            count = todolist_count
+            if count is None:
+                count = User.count_todolists([self])[self.username]
+            return self._representation(count)
+
+        representation = resource_cache.cached(
+            self.__tablename__, self.username, self.revision, build
+        )
+        return select_fields(representation, fields)
+
+    @staticmethod
+    def to_dicts(
+        users: Sequence[User], fields: Collection[str] | None = None
+    ) -> list[dict[str, Any]]:
+        """Returns to_dict() of all users, counting todolists in a single query.
+
+        Only the todolists of users whose representation is not cached are
+        counted, so a page of cached users costs no query at all. Neither
+        does one without todolist_count in its fields.
+        """
+        counted = fields is None or "todolist_count" in fields
+        counts = User.count_todolists(
+            user
+            for user in users
+            if counted
+            and not resource_cache.contains(
+                User.__tablename__, user.username, user.revision
+            )
+        )
+        return [user.to_dict(counts.get(user.username), fields) for user in users]
 
     def promote_to_admin(self) -> Self:
         self.is_admin = True
         return self.save()
 
 
+class SessionUser(UserMixin):
+    """The current_user of a request, holding only what is needed of a User.
+
+    Loading it takes no query as long as it is in the session_user_cache.
+    """
+
+    def __init__(self, id: int, username: str, is_admin: bool) -> None:
+        self.id = id
+        self.username = username
+        self.is_admin = is_admin
+
+    def __repr__(self) -> str:
+        return f"<SessionUser {self.username}>"
+
+
 @login_manager.user_loader
-def load_user(user_id: str) -> User | None:
-    return db.session.get(User, int(user_id))
+def load_user(user_id: str) -> SessionUser | None:
+    ident = int(user_id)
+    fields = session_user_cache.get(ident)
+    if fields is None:
+        row = db.session.execute(
+            select(User.id, User._username, User.is_admin).where(User.id == ident)
+        ).first()
+        if row is None:
+            return None
+        fields = {"id": row[0], "username": row[1], "is_admin": bool(row[2])}
+        session_user_cache.set(ident, fields)
+    return SessionUser(**fields)
 
 
 class TodoList(db.Model, BaseModel):  # type: ignore
     __tablename__ = "todolist"
+    FIELDS: ClassVar[tuple[str, ...]] = (
+        "title",
+        "creator",
+        "created_at",
+        "total_todo_count",
+        "open_todo_count",
+        "finished_todo_count",
+        "todos",
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     _title: Mapped[str | None] = mapped_column("title", String(128))
     created_at: Mapped[datetime | None] = mapped_column(
         DateTime, default=lambda: datetime.now(UTC)
     )
-    creator: Mapped[str | None] = mapped_column(String(64), ForeignKey("user.username"))
+    creator: Mapped[str | None] = mapped_column(
+        String(64), ForeignKey("user.username"), index=True
+    )
+    open_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    finished_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
     todos: DynamicMapped[Todo] = relationship(
         "Todo", backref="todolist", lazy="dynamic"
     )
@@ -174,10 +540,29 @@ class TodoList(db.Model, BaseModel):  # type: ignore
         self.title = title or "untitled"
         self.creator = creator
         self.created_at = created_at or datetime.now(UTC)
+        self.open_count = 0
+        self.finished_count = 0
 
     def __repr__(self) -> str:
         return f"<Todolist: {self.title}>"
 
+    @classmethod
+    def insert_rows(cls, rows: Sequence[Mapping[str, Any]]) -> list[int]:
+        creators = {row["creator"] for row in rows if row.get("creator")}
+        if creators:
+            User.touch_usernames(*creators)
+        return super().insert_rows(rows)
+
+    def save(self) -> Self:
+        if not inspect(self).has_identity and self.creator is not None:
+            User.touch_usernames(self.creator)
+        return super().save()
+
+    def delete(self) -> None:
+        if inspect(self).has_identity and self.creator is not None:
+            User.touch_usernames(self.creator)
+        super().delete()
+
     @property
     def title(self) -> str:
         value = self._title
@@ -187,49 +572,161 @@ class TodoList(db.Model, BaseModel):  # type: ignore
 
     @title.setter
     def title(self, title: str) -> None:
-        if not check_length(title, 128):
-            raise ValueError(f"{title} is not a valid title")
-        self._title = title
+        self._title = TodoList.validate_title(title)
 
     title = synonym("_title", descriptor=title)  # type: ignore
 
+    @staticmethod
+    def validate_title(title: object) -> str:
+        """Returns the title if it is a valid one, raises otherwise."""
+        if not isinstance(title, str) or not check_length(title, 128):
+            raise ValueError(f"{title} is not a valid title")
+        return title
+
     @property
     def todos_url(self) -> str:
         if self.creator:
-            return url_for(
-                "api.get_user_todolist_todos",
-                username=self.creator,
-                todolist_id=self.id,
-                _external=True,
-            )
-        return url_for("api.get_todolist_todos", todolist_id=self.id, _external=True)
-
-    def to_dict(self) -> dict[str, Any]:
-        return {
-            "title": self.title,
-            "creator": self.creator,
-            "created_at": self.created_at,
-            "total_todo_count": self.todo_count,
-            "open_todo_count": self.open_count,
-            "finished_todo_count": self.finished_count,
-            "todos": self.todos_url,
-        }
+            return url_template(
+                "api.get_user_todolist_todos", "username", "todolist_id"
+            )(username=self.creator, todolist_id=self.id)
+        return url_template("api.get_todolist_todos", "todolist_id")(
+            todolist_id=self.id
+        )
+
+    def to_dict(
+        self,
+        fields: Collection[str] | None = None,
+        todos: Sequence[Todo] | None = None,
+    ) -> dict[str, Any]:
+        """Returns the representation, with the given todos embedded if any."""
+        representation = resource_cache.cached(
+            self.__tablename__,
+            self.id,
+            self.revision,
+            lambda: {
+                "title": self.title,
+                "creator": self.creator,
+                "created_at": self.created_at,
+                "total_todo_count": self.todo_count,
+                "open_todo_count": self.open_count,
+                "finished_todo_count": self.finished_count,
+                "todos": self.todos_url,
+            },
+        )
+        if todos is not None:
+            representation["todos"] = [todo.to_dict() for todo in todos]
+        return select_fields(representation, fields)
+
+    @staticmethod
+    def load_todos(todolists: Sequence[TodoList]) -> dict[int, list[Todo]]:
+        """Loads the todos of all todolists in a single query."""
+        todos: dict[int, list[Todo]] = {todolist.id: [] for todolist in todolists}
+        if todos:
+            stmt = select(Todo).where(Todo.todolist_id.in_(todos)).order_by(Todo.id)
+            for todo in db.session.scalars(stmt):
+                todos[todo.todolist_id].append(todo)  # type: ignore
+        return todos
 
     @property
     def todo_count(self) -> int:
-        return int(self.todos.order_by(None).count())
+        return self.open_count + self.finished_count
+
+    @staticmethod
+    def adjust_counts(todolist_id: int, open: int = 0, finished: int = 0) -> None:
+        """Adds the given deltas to the todo counters of a todolist.
+
+        The update is issued within the current transaction, so the counters
+        are committed (or rolled back) together with the todo change.
+        """
+        db.session.execute(
+            update(TodoList)
+            .where(TodoList.id == todolist_id)
+            .values(
+                open_count=TodoList.open_count + open,
+                finished_count=TodoList.finished_count + finished,
+                version=TodoList.version + 1,
+                updated_at=datetime.now(UTC),
+            )
+        )
+        invalidate_cached(TodoList.__tablename__, todolist_id)
+
+    @staticmethod
+    def _counted_todos(finished: bool) -> ScalarSelect[int]:
+        is_finished = Todo.is_finished.is_(True)
+        return (
+            select(func.count(Todo.id))
+            .where(
+                Todo.todolist_id == TodoList.id,
+                is_finished if finished else ~is_finished,
+            )
+            .scalar_subquery()
+        )
 
-    @property
-    def finished_count(self) -> int:
-        return int(self.todos.filter_by(is_finished=True).count())
+    @staticmethod
+    def _counter_drift() -> ColumnElement[bool]:
+        return or_(
+            TodoList.open_count != TodoList._counted_todos(finished=False),
+            TodoList.finished_count != TodoList._counted_todos(finished=True),
+        )
 
-    @property
-    def open_count(self) -> int:
-        return int(self.todos.filter_by(is_finished=False).count())
+    @staticmethod
+    def find_counter_drift() -> list[tuple[int, int, int, int, int]]:
+        """Returns the todolists whose counters disagree with their todos.
+
+        Each entry is (id, open_count, finished_count, actual open count,
+        actual finished count).
+        """
+        stmt = (
+            select(
+                TodoList.id,
+                TodoList.open_count,
+                TodoList.finished_count,
+                TodoList._counted_todos(finished=False),
+                TodoList._counted_todos(finished=True),
+            )
+            .where(TodoList._counter_drift())
+            .order_by(TodoList.id)
+        )
+        return [tuple(row) for row in db.session.execute(stmt)]  # type: ignore
+
+    @staticmethod
+    def recount(*criteria: ColumnElement[bool]) -> list[int]:
+        """Recounts the todos of the todolists matching criteria.
+
+        The update is issued within the current transaction. Returns the ids
+        of the recounted todolists.
+        """
+        ids = db.session.scalars(
+            update(TodoList)
+            .where(*criteria)
+            .values(
+                open_count=TodoList._counted_todos(finished=False),
+                finished_count=TodoList._counted_todos(finished=True),
+                version=TodoList.version + 1,
+                updated_at=datetime.now(UTC),
+            )
+            .returning(TodoList.id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        invalidate_cached(TodoList.__tablename__, *ids)
+        return list(ids)
+
+    @staticmethod
+    def repair_counters() -> int:
+        """Recounts the todos of every drifted todolist, returns their number."""
+        ids = TodoList.recount(TodoList._counter_drift())
+        db.session.commit()
+        return len(ids)
 
 
 class Todo(db.Model, BaseModel):  # type: ignore
     __tablename__ = "todo"
+    FIELDS: ClassVar[tuple[str, ...]] = (
+        "description",
+        "creator",
+        "created_at",
+        "status",
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     description: Mapped[str | None] = mapped_column(String(128))
     created_at: Mapped[datetime | None] = mapped_column(
@@ -240,7 +737,13 @@ class Todo(db.Model, BaseModel):  # type: ignore
     )
     is_finished: Mapped[bool] = mapped_column(Boolean, default=False)
     creator: Mapped[str | None] = mapped_column(String(64), ForeignKey("user.username"))
-    todolist_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("todolist.id"))
+    todolist_id: Mapped[int | None] = mapped_column(
+        Integer, ForeignKey("todolist.id"), index=True
+    )
+
+    __table_args__ = (
+        Index("ix_todo_todolist_id_is_finished", "todolist_id", "is_finished"),
+    )
 
     def __init__(
         self,
@@ -259,24 +762,175 @@ class Todo(db.Model, BaseModel):  # type: ignore
             self.status, self.description, self.creator or "None"
         )
 
+    @staticmethod
+    def validate_description(description: object) -> str:
+        """Returns the description if it is a valid one, raises otherwise."""
+        if not isinstance(description, str) or not check_length(description, 128):
+            raise ValueError(f"{description} is not a valid description")
+        return description
+
+    @classmethod
+    def insert_rows(cls, rows: Sequence[Mapping[str, Any]]) -> list[int]:
+        counts = Counter(
+            (row["todolist_id"], bool(row.get("is_finished"))) for row in rows
+        )
+        for (todolist_id, is_finished), count in counts.items():
+            if is_finished:
+                TodoList.adjust_counts(todolist_id, finished=count)
+            else:
+                TodoList.adjust_counts(todolist_id, open=count)
+        return super().insert_rows(rows)
+
+    @classmethod
+    def update_rows(
+        cls, criteria: Sequence[ColumnElement[bool]], values: Mapping[str, Any]
+    ) -> list[int]:
+        # the todolists the todos leave or join, recounted in the same transaction
+        todolist_ids = set(
+            db.session.scalars(select(Todo.todolist_id).where(*criteria).distinct())
+        )
+        if values.get("todolist_id") is not None:
+            todolist_ids.add(values["todolist_id"])
+        with transaction():
+            ids = super().update_rows(criteria, values)
+            if ids and todolist_ids:
+                TodoList.recount(TodoList.id.in_(todolist_ids))
+        return ids
+
+    @staticmethod
+    def update_where(
+        *criteria: ColumnElement[bool],
+        is_finished: bool | None = None,
+        todolist_id: int | None = None,
+    ) -> list[int]:
+        """Finishes, reopens and/or moves all todos matching criteria at once.
+
+        Only the todos that actually change are updated, their ids are
+        returned. Todos being finished get finished_at set, unless they were
+        finished already, reopened ones have it cleared. The counters of the
+        todolists involved are recounted.
+        """
+        values: dict[str, Any] = {}
+        changes = []
+        if is_finished is not None:
+            values["is_finished"] = is_finished
+            values["finished_at"] = (
+                case(
+                    (Todo.is_finished.is_(True), Todo.finished_at),
+                    else_=datetime.now(UTC),
+                )
+                if is_finished
+                else None
+            )
+            changes.append(Todo.is_finished != is_finished)
+        if todolist_id is not None:
+            values["todolist_id"] = todolist_id
+            changes.append(Todo.todolist_id != todolist_id)
+        if not changes:
+            return []
+        return Todo.update_rows([*criteria, or_(*changes)], values)
+
     @property
     def status(self) -> str:
         return "finished" if self.is_finished else "open"
 
+    def save(self) -> Self:
+        if not inspect(self).has_identity and self.todolist_id is not None:
+            if self.is_finished:
+                TodoList.adjust_counts(self.todolist_id, finished=1)
+            else:
+                TodoList.adjust_counts(self.todolist_id, open=1)
+        return super().save()
+
+    def delete(self) -> None:
+        if inspect(self).has_identity and self.todolist_id is not None:
+            if self.is_finished:
+                TodoList.adjust_counts(self.todolist_id, finished=-1)
+            else:
+                TodoList.adjust_counts(self.todolist_id, open=-1)
+        super().delete()
+
     def finished(self) -> None:
+        if not self.is_finished and inspect(self).has_identity:
+            if self.todolist_id is not None:
+                TodoList.adjust_counts(self.todolist_id, open=-1, finished=1)
         self.is_finished = True
         self.finished_at = datetime.now(UTC)
         self.save()
 
     def reopen(self) -> None:
+        if self.is_finished and inspect(self).has_identity:
+            if self.todolist_id is not None:
+                TodoList.adjust_counts(self.todolist_id, open=1, finished=-1)
         self.is_finished = False
         self.finished_at = None
         self.save()
 
-    def to_dict(self) -> dict[str, Any]:
-        return {
-            "description": self.description,
-            "creator": self.creator,
-            "created_at": self.created_at,
-            "status": self.status,
-        }
+    def to_dict(self, fields: Collection[str] | None = None) -> dict[str, Any]:
+        representation = resource_cache.cached(
+            self.__tablename__,
+            self.id,
+            self.revision,
+            lambda: {
+                "description": self.description,
+                "creator": self.creator,
+                "created_at": self.created_at,
+                "status": self.status,
+            },
+        )
+        return select_fields(representation, fields)
+
+
+# The full-text index of todo descriptions and todolist titles, an SQLite FTS5
+# table. Its rowid is 2 * id for todos and 2 * id + 1 for todolists, its
+# todolist_id the todolist a row belongs to. Triggers keep it in sync with
+# both tables, bulk inserts and updates included.
+SEARCH_INDEX_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        body, todolist_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS todo_search_insert AFTER INSERT ON todo BEGIN
+        INSERT INTO search_index (rowid, body, todolist_id)
+        VALUES (2 * new.id, new.description, new.todolist_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS todo_search_update
+    AFTER UPDATE OF description, todolist_id ON todo BEGIN
+        UPDATE search_index SET body = new.description, todolist_id = new.todolist_id
+        WHERE rowid = 2 * new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS todo_search_delete AFTER DELETE ON todo BEGIN
+        DELETE FROM search_index WHERE rowid = 2 * old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS todolist_search_insert
+    AFTER INSERT ON todolist BEGIN
+        INSERT INTO search_index (rowid, body, todolist_id)
+        VALUES (2 * new.id + 1, new.title, new.id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS todolist_search_update
+    AFTER UPDATE OF title ON todolist BEGIN
+        UPDATE search_index SET body = new.title WHERE rowid = 2 * new.id + 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS todolist_search_delete
+    AFTER DELETE ON todolist BEGIN
+        DELETE FROM search_index WHERE rowid = 2 * old.id + 1;
+    END""",
+]
+
+search_index = TableClause(
+    "search_index",
+    column("rowid", Integer),
+    column("body", String),
+    column("todolist_id", Integer),
+)
+
+# created along with the tables, the migration creates it for existing databases
+for statement in SEARCH_INDEX_DDL:
+    event.listen(
+        db.metadata, "after_create", DDL(statement).execute_if(dialect="sqlite")
+    )
+event.listen(
+    db.metadata,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS search_index").execute_if(dialect="sqlite"),
+)
@@ -0,0 +1,68 @@
+import functools
+import time
+from collections.abc import Iterator
+
+from flask import current_app
+from werkzeug.security import generate_password_hash
+
+# the work factors calibrate() tries, from cheap to expensive
+SCRYPT_COSTS = [2**exponent for exponent in range(12, 21)]
+PBKDF2_ITERATIONS = [50_000 * factor for factor in range(1, 41)]
+
+
+def hash_password(password: str) -> str:
+    """Hashes password with the PASSWORD_HASH_METHOD of the current app."""
+    return generate_password_hash(
+        password, method=current_app.config["PASSWORD_HASH_METHOD"]
+    )
+
+
+@functools.cache
+def canonical_method(method: str) -> str:
+    """Returns method with all parameters spelled out, as stored in hashes.
+
+    E.g. "scrypt" is stored as "scrypt:32768:8:1".
+    """
+    return generate_password_hash("", method=method).split("$", 1)[0]
+
+
+def needs_rehash(password_hash: str) -> bool:
+    """Whether password_hash was made with other than the current parameters."""
+    method = canonical_method(current_app.config["PASSWORD_HASH_METHOD"])
+    return password_hash.split("$", 1)[0] != method
+
+
+def time_method(method: str, rounds: int = 3) -> float:
+    """Returns the fastest of rounds hashes with method, in seconds."""
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        generate_password_hash("correcthorsebatterystaple", method=method)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def candidate_methods(algorithm: str) -> Iterator[str]:
+    if algorithm == "scrypt":
+        return (f"scrypt:{n}:8:1" for n in SCRYPT_COSTS)
+    if algorithm == "pbkdf2":
+        return (f"pbkdf2:sha256:{n}" for n in PBKDF2_ITERATIONS)
+    raise ValueError(f"{algorithm} is not a supported algorithm")
+
+
+def calibrate(
+    target: float, algorithm: str = "scrypt"
+) -> tuple[str, float, list[tuple[str, float]]]:
+    """Picks the most expensive method hashing within target seconds here.
+
+    The candidates are timed from cheap to expensive, stopping at the first
+    one over target. Returns the chosen method, its time and all timings. If
+    even the cheapest is too slow, that one is chosen.
+    """
+    timings = []
+    for method in candidate_methods(algorithm):
+        timings.append((method, time_method(method)))
+        if timings[-1][1] > target:
+            break
+    within = [timing for timing in timings if timing[1] <= target] or timings[:1]
+    return *within[-1], timings
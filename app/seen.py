@@ -0,0 +1,82 @@
+import atexit
+import threading
+import time
+from datetime import UTC, datetime
+from typing import Any
+
+from flask import Flask, current_app
+from sqlalchemy import case
+from sqlalchemy.orm.attributes import set_committed_value
+
+
+class _Pending:
+    """The last_seen times of an app not written yet, by username."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.times: dict[str, datetime] = {}
+        self.lock = threading.Lock()
+        self.flush_at = time.monotonic() + interval
+
+
+class LastSeenBuffer:
+    """Buffers last_seen updates in memory and writes them in batches.
+
+    Logging in then costs no write of its own. The buffered times are
+    written with a single UPDATE once LAST_SEEN_FLUSH_INTERVAL seconds have
+    passed since the last one, on the next login after that, and when the
+    process exits. Until then the API shows the previous last_seen. With an
+    interval of 0 every update is written right away.
+    """
+
+    def init_app(self, app: Flask) -> None:
+        interval = app.config["LAST_SEEN_FLUSH_INTERVAL"]
+        app.extensions["last_seen"] = _Pending(interval)
+        if interval > 0:
+            atexit.register(self._flush_at_exit, app)
+
+    @property
+    def pending(self) -> _Pending:
+        return current_app.extensions["last_seen"]
+
+    def record(self, user: Any) -> None:
+        """Sets the last_seen of user to now, written on the next flush."""
+        now = datetime.now(UTC)
+        pending = self.pending
+        if pending.interval <= 0:
+            user.last_seen = now
+            user.save()
+            return
+        # the user shows the new time without being marked as modified
+        set_committed_value(user, "last_seen", now)
+        with pending.lock:
+            pending.times[user.username] = now
+            due = time.monotonic() >= pending.flush_at
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """Writes all buffered times, returns the number of users updated."""
+        from app.models import User
+
+        pending = self.pending
+        with pending.lock:
+            times, pending.times = pending.times, {}
+            pending.flush_at = time.monotonic() + pending.interval
+        if not times:
+            return 0
+        try:
+            ids = User.update_rows(
+                [User._username.in_(times)],
+                {"last_seen": case(times, value=User._username)},
+            )
+        except Exception:
+            # keep the times for the next flush, unless newer ones came in
+            with pending.lock:
+                pending.times = {**times, **pending.times}
+            raise
+        return len(ids)
+
+    def _flush_at_exit(self, app: Flask) -> None:
+        with app.app_context():
+            self.flush()
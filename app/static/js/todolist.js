@@ -45,18 +45,14 @@ function putNewStatus(todoID, isFinished) {
       }
     }
   });
-  // send put request using the todo of the get for the same id
-  var todoURL = '/api/todo/' + todoID + '/'
-  $.getJSON(todoURL, function(todo) {
-    todo.is_finished = isFinished;
-    $.ajax({
-      url: todoURL,
-      type: 'PUT',
-      contentType: 'application/json',
-      data: JSON.stringify(todo),
-      success: function() {
-        location.reload();
-      }
-    });
+  // the api only reads is_finished, so there is no need to get the todo first
+  $.ajax({
+    url: '/api/todo/' + todoID + '/',
+    type: 'PUT',
+    contentType: 'application/json',
+    data: JSON.stringify({is_finished: isFinished}),
+    success: function() {
+      location.reload();
+    }
   });
 }
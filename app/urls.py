@@ -0,0 +1,44 @@
+from collections.abc import Callable
+from typing import Any
+from urllib.parse import quote
+
+from flask import request, url_for
+
+# stand-ins for the URL arguments, numbers so that int converters accept them
+SENTINEL = 7_310_000_000_000
+
+
+def url_template(endpoint: str, *names: str) -> Callable[..., str]:
+    """Returns a function building external URLs of endpoint from names.
+
+    The route is resolved once per request, after that building a URL is mere
+    string formatting. The arguments are quoted like werkzeug's default
+    converter quotes them.
+    """
+    # kept in the WSGI environment, as g outlives a request when an app
+    # context was already pushed, e.g. in the tests
+    templates = request.environ.setdefault("todolist.url_templates", {})
+    key = (endpoint, names)
+    if key not in templates:
+        templates[key] = _compile(endpoint, names)
+    return templates[key]
+
+
+def _compile(endpoint: str, names: tuple[str, ...]) -> Callable[..., str]:
+    sentinels = {name: SENTINEL + index for index, name in enumerate(names)}
+    template = url_for(endpoint, **sentinels, _external=True)
+    template = template.replace("{", "{{").replace("}", "}}")
+    for name, sentinel in sentinels.items():
+        template = template.replace(str(sentinel), "{" + name + "}")
+
+    def build(**values: Any) -> str:
+        return template.format(
+            **{
+                name: str(value)
+                if isinstance(value, int)
+                else quote(str(value), safe="!$&'()*+,/:;=@")
+                for name, value in values.items()
+            }
+        )
+
+    return build
@@ -2,4 +2,4 @@ from flask import Blueprint
 
 utils = Blueprint("utils", __name__)
 
-from . import errors, filters
+from . import errors, filters, timing
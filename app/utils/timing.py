@@ -0,0 +1,82 @@
+from time import perf_counter
+
+from flask import (
+    before_render_template,
+    current_app,
+    g,
+    has_request_context,
+    template_rendered,
+)
+from flask.json.provider import DefaultJSONProvider
+from flask_sqlalchemy.record_queries import get_recorded_queries
+
+from . import utils
+
+
+def _timings():
+    """Returns the timings of the current request, None if not measured."""
+    if not has_request_context():
+        return None
+    return g.get("server_timing")
+
+
+@utils.before_app_request
+def start_server_timing():
+    if current_app.config["SERVER_TIMING"]:
+        g.server_timing = {
+            "start": perf_counter(),
+            "queries": len(get_recorded_queries()),
+            "template": 0.0,
+            "template_start": [],
+            "serialization": 0.0,
+        }
+
+
+@before_render_template.connect
+def start_template_timing(sender, template, context, **extra):
+    timings = _timings()
+    if timings is not None:
+        timings["template_start"].append(perf_counter())
+
+
+@template_rendered.connect
+def stop_template_timing(sender, template, context, **extra):
+    timings = _timings()
+    if timings is not None and timings["template_start"]:
+        started = timings["template_start"].pop()
+        # nested renders are already part of the outer render's time
+        if not timings["template_start"]:
+            timings["template"] += perf_counter() - started
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """JSON provider that adds its encoding time to the request's timings."""
+
+    def dumps(self, obj, **kwargs):
+        timings = _timings()
+        if timings is None:
+            return super().dumps(obj, **kwargs)
+        started = perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            timings["serialization"] += perf_counter() - started
+
+
+@utils.after_app_request
+def add_server_timing_header(response):
+    timings = _timings()
+    if timings is None:
+        return response
+    queries = get_recorded_queries()[timings["queries"] :]
+    db_time = sum(query.duration for query in queries)
+    total = perf_counter() - timings["start"]
+    response.headers["Server-Timing"] = ", ".join(
+        [
+            f"total;dur={total * 1000:.2f}",
+            f'db;dur={db_time * 1000:.2f};desc="{len(queries)} queries"',
+            f"template;dur={timings['template'] * 1000:.2f}",
+            f"serialization;dur={timings['serialization'] * 1000:.2f}",
+        ]
+    )
+    return response
@@ -7,15 +7,64 @@ def create_sqlite_uri(db_name):
     return "sqlite:///" + os.path.join(BASEDIR, db_name)
 
 
+# for concurrent workers: readers don't block the writer with WAL, which only
+# needs an fsync at checkpoints with synchronous=NORMAL, and a locked database
+# is waited for up to busy_timeout ms instead of failing right away
+WAL_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -20000,  # in KiB, i.e. 20 MB
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+}
+
+
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY")
     SQLALCHEMY_COMMIT_ON_TEARDOWN = True
     SQLALCHEMY_RECORD_QUERIES = True
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # run on every new SQLite connection, see app/database.py
+    SQLITE_PRAGMAS = WAL_PRAGMAS
+    # GET requests read from the replica, if set, see app/database.py
+    SQLALCHEMY_BINDS = (
+        {"replica": os.environ["DATABASE_REPLICA_URL"]}
+        if os.environ.get("DATABASE_REPLICA_URL")
+        else {}
+    )
+    REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS") or 5)
+    # pool settings of server databases, e.g. PostgreSQL
+    DATABASE_POOL_SIZE = int(os.environ.get("DATABASE_POOL_SIZE") or 10)
+    DATABASE_POOL_RECYCLE = int(os.environ.get("DATABASE_POOL_RECYCLE") or 1800)
+    # adds a Server-Timing header with total, db, template and serialization time
+    SERVER_TIMING = bool(os.environ.get("SERVER_TIMING"))
+    API_PAGE_SIZE = int(os.environ.get("API_PAGE_SIZE") or 50)
+    API_MAX_PAGE_SIZE = int(os.environ.get("API_MAX_PAGE_SIZE") or 500)
+    API_MAX_BULK_SIZE = int(os.environ.get("API_MAX_BULK_SIZE") or 1000)
+    API_STREAM_CHUNK_SIZE = int(os.environ.get("API_STREAM_CHUNK_SIZE") or 1000)
+    IMPORT_CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE") or 1000)
+    # caches the API representations of users, todolists and todos
+    RESOURCE_CACHE_BACKEND = os.environ.get("RESOURCE_CACHE_BACKEND") or "lru"
+    RESOURCE_CACHE_SIZE = int(os.environ.get("RESOURCE_CACHE_SIZE") or 10000)
+    RESOURCE_CACHE_TTL = int(os.environ.get("RESOURCE_CACHE_TTL") or 300)
+    # caches the users behind current_user, for this many seconds at most
+    SESSION_USER_CACHE_SIZE = int(os.environ.get("SESSION_USER_CACHE_SIZE") or 10000)
+    SESSION_USER_CACHE_TTL = int(os.environ.get("SESSION_USER_CACHE_TTL") or 30)
+    # werkzeug's method string, `flask calibrate-password-hash` suggests one
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD") or "scrypt:32768:8:1"
+    # seconds last_seen updates are buffered for, 0 writes them right away
+    LAST_SEEN_FLUSH_INTERVAL = float(os.environ.get("LAST_SEEN_FLUSH_INTERVAL") or 60)
 
     @staticmethod
     def init_app(app):
-        pass
+        if not app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+            app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+                "pool_size": app.config["DATABASE_POOL_SIZE"],
+                "pool_recycle": app.config["DATABASE_POOL_RECYCLE"],
+                "pool_pre_ping": True,
+                **app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}),
+            }
 
 
 class DevelopmentConfig(Config):
@@ -28,13 +77,25 @@ class TestingConfig(Config):
     TESTING = True
     SECRET_KEY = os.environ.get("SECRET_KEY") or "testing-secret-key"
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    SQLITE_PRAGMAS = {}
     WTF_CSRF_ENABLED = False
+    LAST_SEEN_FLUSH_INTERVAL = 0
+    # cheap hashes keep the tests fast
+    PASSWORD_HASH_METHOD = "pbkdf2:sha256:1000"
     import logging
 
     logging.basicConfig(format="%(asctime)s:%(levelname)s:%(name)s:%(message)s")
     logging.getLogger().setLevel(logging.DEBUG)
 
 
+class BenchmarkConfig(Config):
+    SECRET_KEY = os.environ.get("SECRET_KEY") or "benchmark-secret-key"
+    SQLALCHEMY_DATABASE_URI = os.environ.get(
+        "BENCHMARK_DATABASE_URL"
+    ) or create_sqlite_uri("todolist-benchmark.db")
+    WTF_CSRF_ENABLED = False
+
+
 class ProductionConfig(Config):
     DEBUG = False
     SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL") or create_sqlite_uri(
@@ -52,5 +113,6 @@ config = {
     "development": DevelopmentConfig,
     "testing": TestingConfig,
     "production": ProductionConfig,
+    "benchmark": BenchmarkConfig,
     "default": DevelopmentConfig,
 }
@@ -0,0 +1,44 @@
+"""Gunicorn settings, picked up from the working directory by `gunicorn`.
+
+The app is loaded once in the master and the workers are forked from it,
+sharing its memory copy-on-write. Environment variables:
+
+WEB_CONCURRENCY          number of workers, 2 per CPU plus 1 by default
+GUNICORN_THREADS         threads per worker, 1 by default
+GUNICORN_WORKER_CLASS    sync, or gthread if GUNICORN_THREADS > 1
+GUNICORN_PRELOAD         0 loads the app in every worker instead
+GUNICORN_BIND            address to listen on, :8000 by default
+"""
+
+import gc
+import os
+
+bind = os.environ.get("GUNICORN_BIND") or ":8000"
+workers = int(os.environ.get("WEB_CONCURRENCY") or (os.cpu_count() or 1) * 2 + 1)
+threads = int(os.environ.get("GUNICORN_THREADS") or 1)
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS") or (
+    "gthread" if threads > 1 else "sync"
+)
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") not in ("0", "false")
+
+
+def when_ready(server):
+    # objects of the preloaded app are never freed, keeping the garbage
+    # collector from touching (and so copying) their pages in the workers
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Drops the database connections a preloaded app inherited.
+
+    A connection opened in the master must not be used by several
+    processes. close=False leaves it open for the master, the worker
+    opens its own on first use.
+    """
+    if not server.cfg.preload_app:
+        return
+    from app import db
+
+    with server.app.wsgi().app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
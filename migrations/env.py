@@ -25,6 +25,17 @@ if not isinstance(database_uri, str):
 config.set_main_option("sqlalchemy.url", database_uri)
 target_metadata = current_app.extensions["migrate"].db.metadata
 
+# tables created by migrations but not in the metadata, autogenerate must
+# not drop them: the full-text index and the shadow tables of FTS5
+UNMANAGED_TABLES = ("search_index",)
+
+
+def include_name(name, type_, parent_names):
+    if type_ == "table":
+        return not (name or "").startswith(UNMANAGED_TABLES)
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -79,6 +90,7 @@ def run_migrations_online():
         connection=connection,
         target_metadata=target_metadata,
         process_revision_directives=process_revision_directives,
+        include_name=include_name,
         **current_app.extensions["migrate"].configure_args
     )
 
@@ -0,0 +1,35 @@
+"""add indexes for hot filters
+
+Revision ID: 3c52a0d6e1f4
+Revises: 767701635e3d
+Create Date: 2026-10-18 10:41:07.118274
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "3c52a0d6e1f4"
+down_revision = "767701635e3d"
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_index(op.f("ix_todo_todolist_id"), "todo", ["todolist_id"], unique=False)
+    op.create_index(
+        "ix_todo_todolist_id_is_finished",
+        "todo",
+        ["todolist_id", "is_finished"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_todolist_creator"), "todolist", ["creator"], unique=False
+    )
+    op.create_index(op.f("ix_user_last_seen"), "user", ["last_seen"], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f("ix_user_last_seen"), table_name="user")
+    op.drop_index(op.f("ix_todolist_creator"), table_name="todolist")
+    op.drop_index("ix_todo_todolist_id_is_finished", table_name="todo")
+    op.drop_index(op.f("ix_todo_todolist_id"), table_name="todo")
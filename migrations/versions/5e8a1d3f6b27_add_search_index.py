@@ -0,0 +1,75 @@
+"""add search index
+
+Revision ID: 5e8a1d3f6b27
+Revises: 9b1f4c2d7a3e
+Create Date: 2026-10-18 18:42:11.204519
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "5e8a1d3f6b27"
+down_revision = "9b1f4c2d7a3e"
+
+from alembic import op
+
+# todos are indexed as rowid 2 * id, todolists as 2 * id + 1
+SEARCH_INDEX_DDL = [
+    """CREATE VIRTUAL TABLE search_index USING fts5(
+        body, todolist_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )""",
+    """CREATE TRIGGER todo_search_insert AFTER INSERT ON todo BEGIN
+        INSERT INTO search_index (rowid, body, todolist_id)
+        VALUES (2 * new.id, new.description, new.todolist_id);
+    END""",
+    """CREATE TRIGGER todo_search_update
+    AFTER UPDATE OF description, todolist_id ON todo BEGIN
+        UPDATE search_index SET body = new.description, todolist_id = new.todolist_id
+        WHERE rowid = 2 * new.id;
+    END""",
+    """CREATE TRIGGER todo_search_delete AFTER DELETE ON todo BEGIN
+        DELETE FROM search_index WHERE rowid = 2 * old.id;
+    END""",
+    """CREATE TRIGGER todolist_search_insert AFTER INSERT ON todolist BEGIN
+        INSERT INTO search_index (rowid, body, todolist_id)
+        VALUES (2 * new.id + 1, new.title, new.id);
+    END""",
+    """CREATE TRIGGER todolist_search_update AFTER UPDATE OF title ON todolist BEGIN
+        UPDATE search_index SET body = new.title WHERE rowid = 2 * new.id + 1;
+    END""",
+    """CREATE TRIGGER todolist_search_delete AFTER DELETE ON todolist BEGIN
+        DELETE FROM search_index WHERE rowid = 2 * old.id + 1;
+    END""",
+]
+
+TRIGGERS = [
+    "todo_search_insert",
+    "todo_search_update",
+    "todo_search_delete",
+    "todolist_search_insert",
+    "todolist_search_update",
+    "todolist_search_delete",
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for statement in SEARCH_INDEX_DDL:
+        op.execute(statement)
+    op.execute(
+        "INSERT INTO search_index (rowid, body, todolist_id) "
+        "SELECT 2 * id, description, todolist_id FROM todo"
+    )
+    op.execute(
+        "INSERT INTO search_index (rowid, body, todolist_id) "
+        "SELECT 2 * id + 1, title, id FROM todolist"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for trigger in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS search_index")
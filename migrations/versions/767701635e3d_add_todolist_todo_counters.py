@@ -0,0 +1,41 @@
+"""add todolist todo counters
+
+Revision ID: 767701635e3d
+Revises: eff90419b076
+Create Date: 2026-10-18 09:12:41.503318
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "767701635e3d"
+down_revision = "eff90419b076"
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    with op.batch_alter_table("todolist") as batch_op:
+        batch_op.add_column(
+            sa.Column("open_count", sa.Integer(), server_default="0", nullable=False)
+        )
+        batch_op.add_column(
+            sa.Column(
+                "finished_count", sa.Integer(), server_default="0", nullable=False
+            )
+        )
+
+    # backfill the counters from the existing todos
+    op.execute(
+        "UPDATE todolist SET "
+        "open_count = (SELECT count(todo.id) FROM todo "
+        "WHERE todo.todolist_id = todolist.id AND todo.is_finished IS NOT TRUE), "
+        "finished_count = (SELECT count(todo.id) FROM todo "
+        "WHERE todo.todolist_id = todolist.id AND todo.is_finished IS TRUE)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("todolist") as batch_op:
+        batch_op.drop_column("finished_count")
+        batch_op.drop_column("open_count")
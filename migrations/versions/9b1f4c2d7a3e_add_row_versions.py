@@ -0,0 +1,38 @@
+"""add row versions
+
+Revision ID: 9b1f4c2d7a3e
+Revises: 3c52a0d6e1f4
+Create Date: 2026-10-18 14:03:27.918204
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "9b1f4c2d7a3e"
+down_revision = "3c52a0d6e1f4"
+
+from alembic import op
+import sqlalchemy as sa
+
+# the backfilled updated_at of each table, its latest known change
+UPDATED_AT = {
+    "user": "last_seen",
+    "todolist": "created_at",
+    "todo": "coalesce(finished_at, created_at)",
+}
+
+
+def upgrade():
+    for table, updated_at in UPDATED_AT.items():
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(
+                sa.Column("version", sa.Integer(), server_default="1", nullable=False)
+            )
+            batch_op.add_column(sa.Column("updated_at", sa.DateTime(), nullable=True))
+        op.execute(f'UPDATE "{table}" SET updated_at = {updated_at}')
+
+
+def downgrade():
+    for table in UPDATED_AT:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("updated_at")
+            batch_op.drop_column("version")
@@ -1,13 +1,21 @@
+import json
 from contextlib import contextmanager
 
 import pytest
 from flask import template_rendered
 from flask import url_for as flask_url_for
+from sqlalchemy import event
 
 from app import create_app
 from app import db as _db
 
 
+def get_json(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return json.loads(response.data.decode("utf-8"))
+
+
 @pytest.fixture
 def app():
     app = create_app("testing")
@@ -50,3 +58,24 @@ def captured_templates(app):
 def templates(app):
     with captured_templates(app) as recorded:
         yield recorded
+
+
+@contextmanager
+def captured_queries(app):
+    recorded = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        recorded.append(statement)
+
+    engine = _db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield recorded
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+@pytest.fixture
+def queries(app):
+    with captured_queries(app) as recorded:
+        yield recorded
@@ -1,7 +1,13 @@
+import gzip
 import json
 
+import pytest
+from flask_sqlalchemy.record_queries import get_recorded_queries
+
 from app import db
+from app.api.importer import Importer
 from app.models import Todo, TodoList, User
+from tests.conftest import get_json
 
 USERNAME_ALICE = "alice"
 PASSWORD = "correcthorsebatterystaple"
@@ -871,3 +877,904 @@ def test_delete_todo(client, url_for):
     )
     assert response.status_code == 200
     assert db.session.get(Todo, todo.id) is None
+
+
+def test_get_todolists_runs_a_fixed_number_of_queries(client, url_for, queries):
+    add_user(USERNAME_ALICE)
+    for title in ("first", "second"):
+        todolist = add_todolist(title, USERNAME_ALICE)
+        add_todo("todo", todolist.id, USERNAME_ALICE)
+
+    queries.clear()
+    response = client.get(url_for("api.get_todolists"))
+    assert response.status_code == 200
+    query_count = len(queries)
+
+    for title in ("third", "fourth", "fifth"):
+        todolist = add_todolist(title, USERNAME_ALICE)
+        add_todo("todo", todolist.id, USERNAME_ALICE)
+
+    queries.clear()
+    response = client.get(url_for("api.get_todolists"))
+    assert response.status_code == 200
+    assert len(json.loads(response.data.decode("utf-8"))["todolists"]) == 5
+    assert len(queries) == query_count
+
+
+def test_get_users_runs_a_fixed_number_of_queries(client, url_for, queries):
+    add_user(USERNAME_ALICE)
+
+    queries.clear()
+    client.get(url_for("api.get_users"))
+    query_count = len(queries)
+
+    for username in ("bob", "carol", "dave"):
+        add_user(username)
+        add_todolist("todolist", username)
+
+    queries.clear()
+    response = client.get(url_for("api.get_users"))
+    assert len(json.loads(response.data.decode("utf-8"))["users"]) == 4
+    assert len(queries) == query_count
+
+
+def test_todolist_counts(client, url_for):
+    todolist = add_todolist("new todolist")
+    add_todo("first", todolist.id)
+    add_todo("second", todolist.id).finished()
+    add_todo("third", todolist.id).finished()
+
+    response = client.get(url_for("api.get_todolists"))
+    json_todolist = json.loads(response.data.decode("utf-8"))["todolists"][0]
+    assert json_todolist["total_todo_count"] == 3
+    assert json_todolist["open_todo_count"] == 1
+    assert json_todolist["finished_todo_count"] == 2
+
+
+def test_user_todolist_count(client, url_for):
+    add_user(USERNAME_ALICE)
+    add_user("bob")
+    add_todolist("first", USERNAME_ALICE)
+    add_todolist("second", USERNAME_ALICE)
+
+    response = client.get(url_for("api.get_users"))
+    users = json.loads(response.data.decode("utf-8"))["users"]
+    counts = {user["username"]: user["todolist_count"] for user in users}
+    assert counts == {USERNAME_ALICE: 2, "bob": 0}
+
+
+def test_get_todolists_pagination(client, url_for):
+    for index in range(5):
+        add_todolist(f"todolist {index}")
+
+    page = get_json(client, url_for("api.get_todolists", limit=2))
+    assert [todolist["title"] for todolist in page["todolists"]] == [
+        "todolist 0",
+        "todolist 1",
+    ]
+    page = get_json(client, page["next"])
+    assert [todolist["title"] for todolist in page["todolists"]] == [
+        "todolist 2",
+        "todolist 3",
+    ]
+    page = get_json(client, page["next"])
+    assert [todolist["title"] for todolist in page["todolists"]] == ["todolist 4"]
+    assert page["next"] is None
+
+
+def test_pagination_keeps_fields_and_embed(client, url_for):
+    for index in range(3):
+        add_todo(f"todo {index}", add_todolist(f"todolist {index}").id)
+
+    url = url_for("api.get_todolists", limit=2, fields="title,todos", embed="todos")
+    pages = []
+    while url:
+        page = get_json(client, url)
+        pages.append(page["todolists"])
+        url = page["next"]
+    assert [len(todolists) for todolists in pages] == [2, 1]
+    for todolist in pages[1]:
+        assert set(todolist) == {"title", "todos"}
+        assert [todo["description"] for todo in todolist["todos"]] == ["todo 2"]
+
+
+def test_get_users_pagination(client, url_for):
+    for username in ("alice", "bob", "carol"):
+        add_user(username)
+
+    page = get_json(client, url_for("api.get_users", limit=2))
+    assert [user["username"] for user in page["users"]] == ["alice", "bob"]
+    page = get_json(client, page["next"])
+    assert [user["username"] for user in page["users"]] == ["carol"]
+    assert page["next"] is None
+
+
+def test_get_user_todolists_pagination(client, url_for):
+    add_user(USERNAME_ALICE)
+    add_user("bob")
+    add_todolist("first", USERNAME_ALICE)
+    add_todolist("bob's", "bob")
+    add_todolist("second", USERNAME_ALICE)
+
+    page = get_json(
+        client, url_for("api.get_user_todolists", username=USERNAME_ALICE, limit=1)
+    )
+    assert [todolist["title"] for todolist in page["todolists"]] == ["first"]
+    page = get_json(client, page["next"])
+    assert [todolist["title"] for todolist in page["todolists"]] == ["second"]
+    assert page["next"] is None
+
+
+def test_get_todolist_todos_pagination(client, url_for):
+    todolist = add_todolist("new todolist", USERNAME_ALICE)
+    for description in ("first", "second", "third"):
+        add_todo(description, todolist.id)
+
+    for endpoint, kwargs in (
+        ("api.get_todolist_todos", {}),
+        ("api.get_user_todolist_todos", {"username": USERNAME_ALICE}),
+    ):
+        page = get_json(
+            client, url_for(endpoint, todolist_id=todolist.id, limit=2, **kwargs)
+        )
+        assert [todo["description"] for todo in page["todos"]] == ["first", "second"]
+        page = get_json(client, page["next"])
+        assert [todo["description"] for todo in page["todos"]] == ["third"]
+        assert page["next"] is None
+
+
+def test_pagination_limit_is_capped(app, client, url_for):
+    app.config["API_MAX_PAGE_SIZE"] = 2
+    for index in range(3):
+        add_todolist(f"todolist {index}")
+
+    page = get_json(client, url_for("api.get_todolists", limit=100))
+    assert len(page["todolists"]) == 2
+    assert "limit=2" in page["next"]
+
+
+def test_pagination_with_invalid_arguments(client, url_for):
+    for args in (
+        {"limit": 0},
+        {"limit": "ten"},
+        {"limit": "²"},
+        {"cursor": -1},
+        {"cursor": "x"},
+        {"cursor": "²"},
+        {"cursor": 2**63},
+    ):
+        response = client.get(url_for("api.get_todolists", **args))
+        assert_400_response(response)
+    response = client.get(url_for("api.get_todolists", cursor=2**63 - 1))
+    assert response.status_code == 200
+
+
+def test_add_todolist_todos_in_bulk(client, url_for, queries):
+    todolist = add_todolist("new todolist")
+    items = [{"description": f"todo {index}"} for index in range(500)]
+
+    queries.clear()
+    response = client.post(
+        url_for("api.add_todolist_todo", todolist_id=todolist.id),
+        headers=get_headers(),
+        data=json.dumps(items),
+    )
+    assert response.status_code == 201
+    inserts = [query for query in queries if query.startswith("INSERT")]
+    assert len(inserts) == 1
+
+    json_response = json.loads(response.data.decode("utf-8"))
+    assert len(json_response["todos"]) == 500
+    assert json_response["todos"][0]["description"] == "todo 0"
+    assert json_response["errors"] == []
+    todolist = db.session.get(TodoList, todolist.id)
+    assert (todolist.open_count, todolist.finished_count) == (500, 0)
+
+
+def test_add_user_todolist_todos_in_bulk_reports_invalid_items(client, url_for):
+    add_user(USERNAME_ALICE)
+    todolist = add_todolist("new todolist", USERNAME_ALICE)
+    items = [{"description": "first"}, {"description": ""}, "second", {}]
+
+    response = client.post(
+        url_for(
+            "api.add_user_todolist_todo",
+            username=USERNAME_ALICE,
+            todolist_id=todolist.id,
+        ),
+        headers=get_headers(),
+        data=json.dumps(items),
+    )
+    assert response.status_code == 201
+    json_response = json.loads(response.data.decode("utf-8"))
+    assert [todo["description"] for todo in json_response["todos"]] == ["first"]
+    assert json_response["todos"][0]["creator"] == USERNAME_ALICE
+    assert [error["index"] for error in json_response["errors"]] == [1, 2, 3]
+    assert db.session.get(TodoList, todolist.id).todo_count == 1
+
+
+def test_add_todolist_todos_in_bulk_without_valid_items(client, url_for):
+    todolist = add_todolist("new todolist")
+    url = url_for("api.add_todolist_todo", todolist_id=todolist.id)
+
+    response = client.post(url, headers=get_headers(), data=json.dumps([]))
+    assert_400_response(response)
+    response = client.post(
+        url, headers=get_headers(), data=json.dumps([{"description": 129 * "t"}])
+    )
+    assert_400_response(response)
+    assert len(json.loads(response.data.decode("utf-8"))["errors"]) == 1
+
+
+def test_add_todolist_todos_in_bulk_with_too_many_items(app, client, url_for):
+    app.config["API_MAX_BULK_SIZE"] = 2
+    todolist = add_todolist("new todolist")
+    response = client.post(
+        url_for("api.add_todolist_todo", todolist_id=todolist.id),
+        headers=get_headers(),
+        data=json.dumps([{"description": "todo"}] * 3),
+    )
+    assert_400_response(response)
+
+
+def parse_server_timing(header):
+    metrics = {}
+    for metric in header.split(", "):
+        name, *params = metric.split(";")
+        metrics[name] = dict(param.split("=", 1) for param in params)
+    return metrics
+
+
+def test_update_todos(client, url_for, queries):
+    todolist = add_todolist("new todolist")
+    todos = [add_todo(f"todo {index}", todolist.id) for index in range(3)]
+    todos[0].finished()
+    finished_at = db.session.get(Todo, todos[0].id).finished_at
+    url = url_for("api.update_todos")
+
+    queries.clear()
+    response = client.put(
+        url,
+        headers=get_headers(),
+        data=json.dumps({"todo_ids": [todo.id for todo in todos], "is_finished": True}),
+    )
+    assert response.status_code == 200
+    # the first todo was finished already
+    assert json.loads(response.data.decode("utf-8")) == {"updated": 2}
+    # the affected todolists, the todos and the todolists recounted
+    assert len([query for query in queries if query.startswith("UPDATE")]) == 2
+
+    todos = Todo.query.order_by(Todo.id).all()
+    assert all(todo.is_finished for todo in todos)
+    assert all(todo.finished_at for todo in todos)
+    assert todos[0].finished_at == finished_at
+    response = get_json(
+        client, url_for("api.get_todolist", todolist_id=todolist.id, embed="todos")
+    )
+    assert response["open_todo_count"] == 0
+    assert response["finished_todo_count"] == 3
+    assert {todo["status"] for todo in response["todos"]} == {"finished"}
+
+    response = client.put(
+        url_for("api.update_todolist_todos", todolist_id=todolist.id),
+        headers=get_headers(),
+        data=json.dumps({"is_finished": False}),
+    )
+    assert json.loads(response.data.decode("utf-8")) == {"updated": 3}
+    assert Todo.query.filter_by(finished_at=None).count() == 3
+
+
+def test_move_todos(client, url_for):
+    source = add_todolist("source")
+    target = add_todolist("target")
+    todos = [add_todo(f"todo {index}", source.id) for index in range(3)]
+    todos[0].finished()
+    target_url = url_for("api.get_todolist", todolist_id=target.id)
+    etag = client.get(target_url).headers["ETag"]
+
+    response = client.put(
+        url_for("api.update_todolist_todos", todolist_id=source.id),
+        headers=get_headers(),
+        data=json.dumps(
+            {"todo_ids": [todos[0].id, todos[1].id], "todolist_id": target.id}
+        ),
+    )
+    assert json.loads(response.data.decode("utf-8")) == {"updated": 2}
+
+    source_json = get_json(client, url_for("api.get_todolist", todolist_id=source.id))
+    assert source_json["open_todo_count"] == 1
+    assert source_json["finished_todo_count"] == 0
+    response = client.get(target_url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    target_json = json.loads(response.data.decode("utf-8"))
+    assert target_json["open_todo_count"] == 1
+    assert target_json["finished_todo_count"] == 1
+    assert TodoList.find_counter_drift() == []
+
+
+def test_update_todos_invalid(client, url_for):
+    todolist = add_todolist("new todolist")
+    todo = add_todo("first", todolist.id)
+    url = url_for("api.update_todos")
+    for payload in (
+        [todo.id],
+        {"todo_ids": [todo.id]},
+        {"is_finished": True},
+        {"todo_ids": [], "is_finished": True},
+        {"todo_ids": ["1"], "is_finished": True},
+        {"todo_ids": [todo.id], "is_finished": "yes"},
+        {"todo_ids": [todo.id], "todolist_id": 42},
+    ):
+        response = client.put(url, headers=get_headers(), data=json.dumps(payload))
+        assert response.status_code == 400
+    assert not db.session.get(Todo, todo.id).is_finished
+
+
+def test_server_timing_header(app, client, url_for):
+    app.config["SERVER_TIMING"] = True
+    add_todolist("new todolist")
+
+    response = client.get(url_for("api.get_todolists"))
+    metrics = parse_server_timing(response.headers["Server-Timing"])
+    assert set(metrics) == {"total", "db", "template", "serialization"}
+    assert metrics["db"]["desc"] == '"1 queries"'
+    assert float(metrics["serialization"]["dur"]) > 0
+    assert float(metrics["total"]["dur"]) >= float(metrics["db"]["dur"])
+
+
+def test_server_timing_header_is_opt_in(client, url_for):
+    response = client.get(url_for("api.get_todolists"))
+    assert "Server-Timing" not in response.headers
+
+
+def test_get_todo_not_modified(client, url_for):
+    todolist = add_todolist("new todolist")
+    todo = add_todo("first", todolist.id)
+    url = url_for("api.get_todo", todo_id=todo.id)
+
+    response = client.get(url)
+    etag = response.headers["ETag"]
+    last_modified = response.headers["Last-Modified"]
+    assert not etag.startswith("W/")
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"] == etag
+
+    response = client.get(url, headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+
+def test_etag_changes_with_the_todo(client, url_for):
+    todolist = add_todolist("new todolist")
+    todo = add_todo("first", todolist.id)
+    url = url_for("api.get_todo", todo_id=todo.id)
+    etag = client.get(url).headers["ETag"]
+
+    client.put(url, headers=get_headers(), data=json.dumps({"is_finished": True}))
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert json.loads(response.data.decode("utf-8"))["status"] == "finished"
+    assert response.headers["ETag"] != etag
+
+
+def test_etag_changes_with_a_reused_id(client, url_for):
+    create_admin_user()
+    login_user(client, url_for, "admin")
+    todolist = add_todolist("first")
+    url = url_for("api.get_todolist", todolist_id=todolist.id)
+    etag = client.get(url).headers["ETag"]
+
+    response = client.delete(
+        url_for("api.delete_todolist", todolist_id=todolist.id),
+        headers=get_headers(),
+        data=json.dumps({"todolist_id": todolist.id}),
+    )
+    assert response.status_code == 200
+    assert add_todolist("second").id == todolist.id
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert json.loads(response.data.decode("utf-8"))["title"] == "second"
+
+
+def test_etag_changes_with_related_rows(client, url_for):
+    add_user(USERNAME_ALICE)
+    todolist = add_todolist("new todolist", USERNAME_ALICE)
+    user_url = url_for("api.get_user", username=USERNAME_ALICE)
+    todolist_url = url_for("api.get_todolist", todolist_id=todolist.id)
+    user_etag = client.get(user_url).headers["ETag"]
+    todolist_etag = client.get(todolist_url).headers["ETag"]
+
+    # a new todo changes the counts of its todolist
+    add_todo("first", todolist.id)
+    response = client.get(todolist_url, headers={"If-None-Match": todolist_etag})
+    assert response.status_code == 200
+
+    # a new todolist changes the todolist_count of its creator
+    add_todolist("second todolist", USERNAME_ALICE)
+    response = client.get(user_url, headers={"If-None-Match": user_etag})
+    assert response.status_code == 200
+    assert json.loads(response.data.decode("utf-8"))["todolist_count"] == 2
+
+
+def test_collection_not_modified_skips_count_queries(client, url_for, queries):
+    for username in ("alice", "bob"):
+        add_user(username)
+        add_todolist("todolist", username)
+    url = url_for("api.get_users")
+
+    queries.clear()
+    etag = client.get(url).headers["ETag"]
+    query_count = len(queries)
+
+    queries.clear()
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert len(queries) == query_count - 1
+
+    add_user("carol")
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(json.loads(response.data.decode("utf-8"))["users"]) == 3
+
+
+def test_get_todolists_streamed(app, client, url_for):
+    app.config["API_STREAM_CHUNK_SIZE"] = 2
+    for index in range(5):
+        add_todolist(f"todolist {index}")
+
+    response = client.get(url_for("api.get_todolists", stream=1))
+    assert response.is_streamed
+    streamed = json.loads(response.data.decode("utf-8"))
+    assert streamed["next"] is None
+    assert (
+        streamed["todolists"]
+        == get_json(client, url_for("api.get_todolists", limit=5))["todolists"]
+    )
+
+    streamed = get_json(client, url_for("api.get_todolists", stream=1, cursor=3))
+    assert [todolist["title"] for todolist in streamed["todolists"]] == [
+        "todolist 3",
+        "todolist 4",
+    ]
+
+
+def test_get_users_streamed_as_ndjson(app, client, url_for, queries):
+    app.config["API_STREAM_CHUNK_SIZE"] = 2
+    for username in ("alice", "bob", "carol"):
+        add_user(username)
+        add_todolist("todolist", username)
+
+    queries.clear()
+    response = client.get(
+        url_for("api.get_users"), headers={"Accept": "application/x-ndjson"}
+    )
+    assert response.mimetype == "application/x-ndjson"
+    users = [json.loads(line) for line in response.data.decode("utf-8").splitlines()]
+    assert [user["username"] for user in users] == ["alice", "bob", "carol"]
+    assert [user["todolist_count"] for user in users] == [1, 1, 1]
+    # the users, and their todolists counted once per chunk
+    assert len(queries) == 3
+
+
+def test_get_empty_collection_streamed(client, url_for):
+    response = client.get(url_for("api.get_users", stream=1))
+    assert json.loads(response.data.decode("utf-8")) == {"users": [], "next": None}
+
+
+def test_get_todolist_with_embedded_todos(client, url_for, queries):
+    todolist = add_todolist("new todolist")
+    first = add_todo("first", todolist.id)
+    add_todo("second", todolist.id)
+    url = url_for("api.get_todolist", todolist_id=todolist.id, embed="todos")
+
+    queries.clear()
+    response = get_json(client, url)
+    assert [todo["description"] for todo in response["todos"]] == ["first", "second"]
+    assert response["todos"][0] == get_json(
+        client, url_for("api.get_todo", todo_id=first.id)
+    )
+    # the todolist is still in the session, its todos take a single query
+    assert len(queries) == 1
+
+    # the embedded todos are part of the ETag
+    etag = client.get(url).headers["ETag"]
+    first.finished()
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert json.loads(response.data.decode("utf-8"))["todos"][0]["status"] == (
+        "finished"
+    )
+
+
+def test_get_todolists_with_embedded_todos(app, client, url_for, queries):
+    app.config["API_STREAM_CHUNK_SIZE"] = 2
+    for index in range(3):
+        todolist = add_todolist(f"todolist {index}")
+        add_todo(f"todo {index}", todolist.id)
+    add_todolist("empty todolist")
+
+    queries.clear()
+    todolists = get_json(client, url_for("api.get_todolists", embed="todos"))[
+        "todolists"
+    ]
+    assert [
+        [todo["description"] for todo in todolist["todos"]] for todolist in todolists
+    ] == [["todo 0"], ["todo 1"], ["todo 2"], []]
+    # the todolists, then the todos of all of them at once
+    assert len(queries) == 2
+
+    streamed = get_json(client, url_for("api.get_todolists", embed="todos", stream=1))
+    assert streamed["todolists"] == todolists
+
+
+def test_sparse_fieldsets(client, url_for, queries):
+    add_user(USERNAME_ALICE)
+    todolist = add_todolist("new todolist", USERNAME_ALICE)
+    todo = add_todo("first", todolist.id)
+
+    response = get_json(
+        client,
+        url_for("api.get_todolist", todolist_id=todolist.id, fields="title,created_at"),
+    )
+    assert set(response) == {"title", "created_at"}
+    response = get_json(
+        client, url_for("api.get_todo", todo_id=todo.id, fields="status")
+    )
+    assert response == {"status": "open"}
+
+    # without todolist_count the todolists are not counted
+    queries.clear()
+    response = get_json(client, url_for("api.get_users", fields="username"))
+    assert response["users"] == [{"username": USERNAME_ALICE}]
+    assert len(queries) == 1
+    response = get_json(
+        client, url_for("api.get_user", username=USERNAME_ALICE, fields="username")
+    )
+    assert response == {"username": USERNAME_ALICE}
+
+    # the full representation is unaffected
+    response = get_json(client, url_for("api.get_user", username=USERNAME_ALICE))
+    assert response["todolist_count"] == 1
+
+
+def test_fields_and_embed_are_validated(client, url_for):
+    todolist = add_todolist("new todolist")
+    for args in (
+        {"fields": "title,secret"},
+        {"fields": ","},
+        {"embed": "creator"},
+    ):
+        response = client.get(
+            url_for("api.get_todolist", todolist_id=todolist.id, **args)
+        )
+        assert response.status_code == 400
+    response = client.get(url_for("api.get_users", fields="title"))
+    assert response.status_code == 400
+
+
+def test_fields_change_the_etag(client, url_for):
+    todolist = add_todolist("new todolist")
+    url = url_for("api.get_todolist", todolist_id=todolist.id)
+    etag = client.get(url).headers["ETag"]
+
+    response = client.get(
+        url_for("api.get_todolist", todolist_id=todolist.id, fields="title"),
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 200
+
+
+def read_ndjson(response):
+    return [json.loads(line) for line in response.data.decode("utf-8").splitlines()]
+
+
+def test_export_user(client, url_for):
+    add_user(USERNAME_ALICE)
+    add_user("bob")
+    first = add_todolist("first", USERNAME_ALICE)
+    empty = add_todolist("empty", USERNAME_ALICE)
+    add_todolist("bob's", "bob")
+    add_todo("open", first.id, USERNAME_ALICE)
+    add_todo("done", first.id, USERNAME_ALICE).finished()
+
+    response = client.get(url_for("api.export_user", username=USERNAME_ALICE))
+    assert response.mimetype == "application/x-ndjson"
+    lines = read_ndjson(response)
+    assert lines[0]["type"] == "user"
+    assert lines[0]["username"] == USERNAME_ALICE
+    assert [(line["type"], line["id"]) for line in lines[1:]] == [
+        ("todolist", first.id),
+        ("todo", 1),
+        ("todo", 2),
+        ("todolist", empty.id),
+    ]
+    assert [line["status"] for line in lines[2:4]] == ["open", "finished"]
+    assert all(line["todolist_id"] == first.id for line in lines[2:4])
+
+
+def test_export_user_since(client, url_for):
+    add_user(USERNAME_ALICE)
+    first = add_todolist("first", USERNAME_ALICE)
+    add_todolist("second", USERNAME_ALICE)
+    add_todo("old", first.id, USERNAME_ALICE)
+    url = url_for("api.export_user", username=USERNAME_ALICE)
+    exported_at = read_ndjson(client.get(url))[0]["exported_at"]
+
+    todo = add_todo("new", first.id, USERNAME_ALICE)
+    lines = read_ndjson(client.get(url, query_string={"since": exported_at}))
+    assert [(line["type"], line["id"]) for line in lines[1:]] == [
+        ("todolist", first.id),
+        ("todo", todo.id),
+    ]
+
+    response = client.get(url, query_string={"since": "yesterday"})
+    assert_400_response(response)
+
+
+def test_export_user_gzipped(client, url_for):
+    add_user(USERNAME_ALICE)
+    todolist = add_todolist("first", USERNAME_ALICE)
+    add_todo("todo", todolist.id, USERNAME_ALICE)
+
+    url = url_for("api.export_user", username=USERNAME_ALICE)
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.content_encoding == "gzip"
+    lines = gzip.decompress(response.data).decode("utf-8").splitlines()
+    assert [json.loads(line)["type"] for line in lines] == ["user", "todolist", "todo"]
+
+
+def test_export_user_when_user_does_not_exist(client, url_for):
+    response = client.get(url_for("api.export_user", username=USERNAME_ALICE))
+    assert_404_response(response)
+
+
+def import_ndjson(client, url_for, username, lines):
+    return client.post(
+        url_for("api.import_user", username=username),
+        headers={"Content-Type": "application/x-ndjson"},
+        data="\n".join(json.dumps(line) for line in lines),
+    )
+
+
+def test_import_user(client, url_for, queries):
+    add_user(USERNAME_ALICE)
+
+    queries.clear()
+    response = import_ndjson(
+        client,
+        url_for,
+        USERNAME_ALICE,
+        [
+            {
+                "title": "nested",
+                "todos": [{"description": "first"}, {"description": ""}],
+            },
+            {"type": "todolist", "id": "flat", "title": "flat"},
+            {"type": "todo", "todolist_id": "flat", "description": "second"},
+            {"type": "todo", "todolist_id": "flat", "description": "third"},
+            {"type": "todo", "todolist_id": "missing", "description": "fourth"},
+            {"type": "todolist", "title": "x" * 129},
+        ],
+    )
+    assert response.status_code == 201
+    report = json.loads(response.data.decode("utf-8"))
+    assert (report["todolists"], report["todos"]) == (2, 3)
+    assert report["error_count"] == 3
+    assert [(error["line"], error.get("todo")) for error in report["errors"]] == [
+        (1, 1),
+        (5, None),
+        (6, None),
+    ]
+    inserts = [query for query in queries if query.startswith("INSERT")]
+    assert len(inserts) == 2
+
+    todolists = get_json(
+        client, url_for("api.get_user_todolists", username=USERNAME_ALICE)
+    )["todolists"]
+    assert [(t["title"], t["open_todo_count"]) for t in todolists] == [
+        ("nested", 1),
+        ("flat", 2),
+    ]
+
+
+def test_import_user_with_duplicate_todolist_id(client, url_for):
+    add_user(USERNAME_ALICE)
+    response = import_ndjson(
+        client,
+        url_for,
+        USERNAME_ALICE,
+        [
+            {"id": 1, "title": "first", "todos": [{"description": "todo"}]},
+            {"id": 1, "title": "second"},
+        ],
+    )
+    assert response.status_code == 201
+    report = json.loads(response.data.decode("utf-8"))
+    assert (report["todolists"], report["todos"]) == (1, 1)
+    assert [error["line"] for error in report["errors"]] == [2]
+    todolist = TodoList.query.one()
+    assert (todolist.title, todolist.open_count) == ("first", 1)
+
+
+def test_import_user_in_chunks(app, client, url_for, queries):
+    app.config["IMPORT_CHUNK_SIZE"] = 2
+    add_user(USERNAME_ALICE)
+    todos = [{"description": f"todo {index}"} for index in range(5)]
+
+    queries.clear()
+    response = import_ndjson(
+        client, url_for, USERNAME_ALICE, [{"title": "list", "todos": todos}]
+    )
+    assert response.status_code == 201
+    inserts = [query for query in queries if query.startswith("INSERT")]
+    assert len(inserts) == 4  # the todolist, then the todos 2, 2 and 1 at a time
+    assert db.session.get(TodoList, 1).open_count == 5
+
+
+def test_import_user_is_all_or_nothing(app, client, url_for, monkeypatch):
+    app.config["IMPORT_CHUNK_SIZE"] = 1
+    add_user(USERNAME_ALICE)
+    insert = Importer.insert
+    chunks = []
+
+    def fail_on_second_chunk(importer):
+        chunks.append(importer.todolists)
+        if len(chunks) == 2:
+            raise RuntimeError("disk full")
+        insert(importer)
+
+    monkeypatch.setattr(Importer, "insert", fail_on_second_chunk)
+    with pytest.raises(RuntimeError):
+        import_ndjson(
+            client, url_for, USERNAME_ALICE, [{"title": "first"}, {"title": "second"}]
+        )
+    assert TodoList.query.count() == 0
+
+
+def test_import_user_records_queries_without_rows(app, client, url_for):
+    app.config["IMPORT_CHUNK_SIZE"] = 2
+    add_user(USERNAME_ALICE)
+    todos = [{"description": f"todo {index}"} for index in range(5)]
+    start = len(get_recorded_queries())
+    response = import_ndjson(
+        client, url_for, USERNAME_ALICE, [{"title": "list", "todos": todos}]
+    )
+    assert response.status_code == 201
+    inserts = [
+        query
+        for query in get_recorded_queries()[start:]
+        if query.statement.startswith("INSERT")
+    ]
+    assert len(inserts) == 4
+    assert all(query.parameters == () for query in inserts)
+
+
+def test_import_user_from_export(client, url_for):
+    add_user(USERNAME_ALICE)
+    add_user("bob")
+    todolist = add_todolist("first", USERNAME_ALICE)
+    add_todo("open", todolist.id, USERNAME_ALICE)
+    add_todo("done", todolist.id, USERNAME_ALICE).finished()
+
+    export = client.get(url_for("api.export_user", username=USERNAME_ALICE)).data
+    response = client.post(url_for("api.import_user", username="bob"), data=export)
+    assert response.status_code == 201
+
+    exported = read_ndjson(client.get(url_for("api.export_user", username="bob")))
+    assert [line.get("title") or line.get("description") for line in exported] == [
+        None,
+        "first",
+        "open",
+        "done",
+    ]
+    assert exported[3]["status"] == "finished"
+
+
+def test_import_user_without_valid_rows(client, url_for):
+    add_user(USERNAME_ALICE)
+    response = client.post(
+        url_for("api.import_user", username=USERNAME_ALICE), data="not json\n"
+    )
+    assert response.status_code == 400
+    report = json.loads(response.data.decode("utf-8"))
+    assert report["error_count"] == 1
+
+
+def search(client, url_for, q, **args):
+    return get_json(client, url_for("api.search_todos", q=q, **args))
+
+
+def test_search(client, url_for):
+    todolist = add_todolist("Groceries")
+    add_todo("buy oat milk for the week", todolist.id)
+    add_todo("buy milk", todolist.id)
+    add_todo("walk the dog", todolist.id)
+
+    # best first, bm25 ranks shorter descriptions higher
+    response = search(client, url_for, "milk")
+    assert [result["description"] for result in response["results"]] == [
+        "buy milk",
+        "buy oat milk for the week",
+    ]
+    assert response["next"] is None
+    first = response["results"][0]
+    assert first["type"] == "todo"
+    assert first["score"] < response["results"][1]["score"]
+    assert first["url"] == url_for("api.get_todo", todo_id=2, _external=True)
+
+    response = search(client, url_for, "gro*")
+    assert [result["type"] for result in response["results"]] == ["todolist"]
+    assert response["results"][0]["title"] == "Groceries"
+    # all words must match, FTS5 syntax is taken literally
+    assert search(client, url_for, "milk dog")["results"] == []
+    assert search(client, url_for, 'milk" OR "dog')["results"] == []
+
+
+def test_search_follows_changes(client, url_for):
+    add_user(USERNAME_ALICE)
+    todolist = add_todolist("first")
+    other = add_todolist("second", USERNAME_ALICE)
+    todo = add_todo("water the plants", todolist.id)
+    login_user(client, url_for, USERNAME_ALICE)
+
+    todo.description = "water the garden"
+    todo.save()
+    assert search(client, url_for, "plants")["results"] == []
+    assert len(search(client, url_for, "garden")["results"]) == 1
+
+    assert search(client, url_for, "garden", mine=1)["results"] == []
+    Todo.update_where(Todo.id == todo.id, todolist_id=other.id)
+    assert len(search(client, url_for, "garden", mine=1)["results"]) == 1
+
+    other.title = "renamed"
+    other.save()
+    assert search(client, url_for, "second")["results"] == []
+    assert len(search(client, url_for, "renamed")["results"]) == 1
+
+    db.session.get(Todo, todo.id).delete()
+    assert search(client, url_for, "garden")["results"] == []
+
+
+def test_search_pagination(client, url_for):
+    todolist = add_todolist("list")
+    for index in range(5):
+        add_todo(f"task {index}", todolist.id)
+
+    descriptions = []
+    url = url_for("api.search_todos", q="task", limit=2)
+    while url:
+        response = get_json(client, url)
+        assert len(response["results"]) <= 2
+        descriptions += [result["description"] for result in response["results"]]
+        url = response["next"]
+    assert sorted(descriptions) == [f"task {index}" for index in range(5)]
+
+    for cursor in ("x:1", "1.0:x", "nan:1", f"1.0:{2**63}"):
+        response = client.get(url_for("api.search_todos", q="task", cursor=cursor))
+        assert_400_response(response)
+
+
+def test_search_mine(client, url_for):
+    add_user(USERNAME_ALICE)
+    add_user("bob")
+    add_todo("errand", add_todolist("errands", USERNAME_ALICE).id, USERNAME_ALICE)
+    add_todo("errand", add_todolist("errands", "bob").id, "bob")
+
+    response = client.get(url_for("api.search_todos", q="errand*", mine=1))
+    assert response.status_code == 401
+    assert len(search(client, url_for, "errand*")["results"]) == 4
+
+    login_user(client, url_for, USERNAME_ALICE)
+    response = search(client, url_for, "errand*", mine=1)
+    assert len(response["results"]) == 2
+    assert {result["creator"] for result in response["results"]} == {USERNAME_ALICE}
+
+
+def test_search_without_query(client, url_for):
+    for q in ("", "  ", "*"):
+        assert_400_response(client.get(url_for("api.search_todos", q=q)))
+    assert_400_response(client.get(url_for("api.search_todos")))
@@ -1,7 +1,12 @@
-from flask import current_app
+import pytest
+from flask import current_app, url_for
+from sqlalchemy import event, select
+from werkzeug.security import generate_password_hash
 
 from app import db
-from app.models import Todo, TodoList, User
+from app.models import Todo, TodoList, User, transaction
+from app.passwords import calibrate, canonical_method, needs_rehash
+from app.urls import url_template
 
 USERNAME_ADAM = "adam"
 SHOPPING_LIST_TITLE = "shopping list"
@@ -62,6 +67,43 @@ def test_password_salts_are_random(app):
     assert u.password_hash != u2.password_hash
 
 
+def test_password_hash_method_is_configurable(app):
+    u = User(password="correcthorsebatterystaple")
+    assert u.password_hash.startswith("pbkdf2:sha256:1000$")
+
+
+def test_password_is_rehashed_on_login(app):
+    user = add_user(USERNAME_ADAM)
+    old_hash = user.password_hash
+    current_app.config["PASSWORD_HASH_METHOD"] = "pbkdf2:sha256:2000"
+
+    assert not user.verify_password("incorrecthorsebatterystaple")
+    assert user.password_hash == old_hash
+
+    assert user.verify_password("correcthorsebatterystaple")
+    db.session.expire_all()
+    user = db.session.get(User, user.id)
+    assert user.password_hash.startswith("pbkdf2:sha256:2000$")
+    assert user.verify_password("correcthorsebatterystaple")
+
+
+def test_canonical_password_hash_method(app):
+    assert canonical_method("scrypt") == "scrypt:32768:8:1"
+    current_app.config["PASSWORD_HASH_METHOD"] = "pbkdf2"
+    assert not needs_rehash(generate_password_hash("x", method="pbkdf2:sha256"))
+
+
+def test_calibrate_password_hash(monkeypatch):
+    costs = {f"pbkdf2:sha256:{50_000 * factor}": factor / 100 for factor in (1, 2, 3)}
+    monkeypatch.setattr("app.passwords.time_method", costs.__getitem__)
+
+    method, seconds, timings = calibrate(0.025, "pbkdf2")
+    assert (method, seconds) == ("pbkdf2:sha256:100000", 0.02)
+    assert len(timings) == 3
+    # the cheapest one, if none is fast enough
+    assert calibrate(0.001, "pbkdf2")[0] == "pbkdf2:sha256:50000"
+
+
 def test_adding_new_user(app):
     new_user = add_user(USERNAME_ADAM)
     assert new_user.username == USERNAME_ADAM
@@ -205,3 +247,118 @@ def test_delete_todo(app):
     todo.delete()
     assert db.session.get(Todo, todo_id) is None
     assert todolist.todo_count == 0
+
+
+def test_todolist_counters_follow_todo_changes(app):
+    todolist = TodoList(SHOPPING_LIST_TITLE).save()
+    first = Todo("first", todolist.id).save()
+    second = Todo("second", todolist.id).save()
+    assert (todolist.open_count, todolist.finished_count) == (2, 0)
+
+    first.finished()
+    first.finished()
+    assert (todolist.open_count, todolist.finished_count) == (1, 1)
+
+    first.reopen()
+    second.finished()
+    assert (todolist.open_count, todolist.finished_count) == (1, 1)
+
+    second.delete()
+    assert (todolist.open_count, todolist.finished_count) == (1, 0)
+    assert todolist.todo_count == 1
+
+
+def test_todolist_counters_for_new_finished_todo(app):
+    todolist = TodoList(SHOPPING_LIST_TITLE).save()
+    Todo("first", todolist.id).finished()
+    assert (todolist.open_count, todolist.finished_count) == (0, 1)
+
+
+def test_todolist_counter_drift_is_found_and_repaired(app):
+    todolist = TodoList(SHOPPING_LIST_TITLE).save()
+    Todo("first", todolist.id).save()
+    Todo("second", todolist.id).finished()
+    other_todolist = TodoList(SHOPPING_LIST_TITLE).save()
+    Todo("third", other_todolist.id).save()
+    assert TodoList.find_counter_drift() == []
+
+    todolist.open_count = 5
+    todolist.save()
+    assert TodoList.find_counter_drift() == [(todolist.id, 5, 1, 1, 1)]
+
+    assert TodoList.repair_counters() == 1
+    assert TodoList.find_counter_drift() == []
+    assert (todolist.open_count, todolist.finished_count) == (1, 1)
+
+
+def count_commits():
+    commits = []
+    event.listen(db.session(), "after_commit", commits.append)
+    return commits
+
+
+def test_transaction_commits_once(app):
+    commits = count_commits()
+    with transaction():
+        todolist = TodoList(SHOPPING_LIST_TITLE).save()
+        Todo("first", todolist.id).save().finished()
+        Todo("second", todolist.id).save()
+        assert commits == []
+    assert len(commits) == 1
+    assert (todolist.open_count, todolist.finished_count) == (1, 1)
+
+
+def test_nested_transactions_commit_once(app):
+    commits = count_commits()
+    with transaction():
+        todolist = TodoList(SHOPPING_LIST_TITLE).save()
+        with transaction():
+            Todo("first", todolist.id).save()
+        assert commits == []
+    assert len(commits) == 1
+    assert todolist.todo_count == 1
+
+
+def test_transaction_rolls_back_on_error(app):
+    with pytest.raises(RuntimeError):
+        with transaction():
+            todolist = TodoList(SHOPPING_LIST_TITLE).save()
+            Todo("first", todolist.id).save()
+            raise RuntimeError
+    assert db.session.execute(select(TodoList)).all() == []
+    assert db.session.execute(select(Todo)).all() == []
+
+
+def test_transaction_as_decorator(app):
+    commits = count_commits()
+
+    @transaction()
+    def add_todolist_with_todo():
+        todolist = TodoList(SHOPPING_LIST_TITLE).save()
+        return Todo("first", todolist.id).save()
+
+    todo = add_todolist_with_todo()
+    assert len(commits) == 1
+    assert todo.todolist.todo_count == 1
+
+
+@pytest.mark.parametrize(
+    "username", ["adam", "ädam", "a/b", "a%20b", "{adam}", "a?b#c", "7310000000000"]
+)
+def test_url_template_matches_url_for(app, username):
+    with app.test_request_context(base_url="https://example.com/root/"):
+        build = url_template("api.get_user_todolist_todos", "username", "todolist_id")
+        assert build(username=username, todolist_id=42) == url_for(
+            "api.get_user_todolist_todos",
+            username=username,
+            todolist_id=42,
+            _external=True,
+        )
+
+
+def test_url_template_is_resolved_once_per_url_root(app):
+    for base_url in ("http://localhost/", "https://example.com/"):
+        with app.test_request_context(base_url=base_url):
+            build = url_template("api.get_user", "username")
+            assert build is url_template("api.get_user", "username")
+            assert build(username="adam") == base_url + "api/user/adam/"
@@ -0,0 +1,92 @@
+import socket
+import threading
+
+from werkzeug.serving import make_server
+
+from utils.benchmark import Benchmark, compare, routes
+from utils.loadtest import LoadTest
+
+
+def test_every_route_is_benchmarked(app):
+    benchmarked = {(route.endpoint, route.method) for route in routes()}
+    routes_of_app = {
+        (rule.endpoint, method)
+        for rule in app.url_map.iter_rules()
+        if rule.endpoint != "static"
+        for method in rule.methods or ()
+        if method not in {"HEAD", "OPTIONS"}
+    }
+    assert routes_of_app - benchmarked == set()
+
+
+def test_benchmark(app):
+    results = Benchmark(app, [10], requests=3, echo=lambda message: None).run()
+
+    assert len(results["results"]) == len(routes())
+    for result in results["results"]:
+        assert result["errors"] == 0, result
+        assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+        assert result["peak_memory_kb"] > 0
+    by_endpoint = {
+        (result["endpoint"], result["method"]): result for result in results["results"]
+    }
+    assert by_endpoint["api.get_todolists", "GET"]["queries"] >= 1
+    assert compare(results, results) == []
+
+
+def test_compare_finds_p95_regressions():
+    result = {"scale": 10, "method": "GET", "endpoint": "api.get_users"}
+    baseline = {"results": [{**result, "p95_ms": 10.0}]}
+    current = {"results": [{**result, "p95_ms": 13.0}]}
+
+    assert compare(baseline, current, threshold=0.5) == []
+    assert compare(baseline, current, threshold=0.2) == [
+        ((10, "GET", "api.get_users"), 10.0, 13.0)
+    ]
+
+
+def test_loadtest(app):
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        results = LoadTest(
+            f"http://127.0.0.1:{server.port}",
+            ["/api/", "/api/missing/"],
+            concurrency=4,
+            requests=8,
+            echo=lambda message: None,
+        ).run()
+    finally:
+        server.shutdown()
+
+    found, missing = results["results"]
+    assert found["errors"] == 0
+    assert found["throughput"] > 0
+    assert found["p50_ms"] <= found["p95_ms"] <= found["p99_ms"]
+    assert missing["errors"] == 8
+
+
+def test_loadtest_counts_dropped_connections():
+    listener = socket.create_server(("127.0.0.1", 0))
+
+    def drop_connections():
+        while True:
+            try:
+                connection, _ = listener.accept()
+            except OSError:
+                return
+            connection.close()
+
+    threading.Thread(target=drop_connections, daemon=True).start()
+    try:
+        results = LoadTest(
+            f"http://127.0.0.1:{listener.getsockname()[1]}",
+            ["/"],
+            concurrency=2,
+            requests=4,
+            echo=lambda message: None,
+        ).run()
+    finally:
+        listener.close()
+    assert results["results"][0]["errors"] == 4
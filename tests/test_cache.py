@@ -0,0 +1,211 @@
+import json
+import threading
+from datetime import UTC, datetime
+
+import pytest
+from sqlalchemy import delete, insert, update
+
+from app import db, resource_cache, session_user_cache
+from app.cache import LRUBackend
+from app.models import Todo, TodoList, User, load_user, transaction
+from tests.conftest import get_json
+
+PASSWORD = "correcthorsebatterystaple"
+
+
+def test_lru_backend_evicts_least_recently_used():
+    backend = LRUBackend(maxsize=2)
+    backend.set("a", {"": {"value": 1}})
+    backend.set("b", {"": {"value": 2}})
+    backend.get("a")
+    backend.set("c", {"": {"value": 3}})
+
+    assert backend.get("b") is None
+    assert backend.get("a") == {"": {"value": 1}}
+    assert backend.stats() == {"evictions": 1, "size": 2}
+
+
+def test_lru_backend_expires_entries(monkeypatch):
+    backend = LRUBackend(ttl=10)
+    backend.set("a", {"": {"value": 1}})
+
+    monkeypatch.setattr("app.cache.time.monotonic", lambda: float("inf"))
+    assert backend.get("a") is None
+    assert backend.stats()["size"] == 0
+
+
+def test_representations_are_cached(client, url_for):
+    todolist = TodoList(title="new todolist").save()
+    url = url_for("api.get_todolist", todolist_id=todolist.id)
+
+    assert get_json(client, url) == get_json(client, url)
+    stats = resource_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+
+
+def test_changes_of_other_processes_are_not_served_stale(client, url_for):
+    todolist = TodoList(title="old").save()
+    url = url_for("api.get_todolist", todolist_id=todolist.id)
+    assert get_json(client, url)["title"] == "old"
+
+    # another process writes the row, this one's entry isn't dropped
+    db.session.execute(
+        update(TodoList)
+        .where(TodoList.id == todolist.id)
+        .values(_title="new", version=TodoList.version + 1)
+    )
+    db.session.commit()
+    db.session.remove()
+    assert get_json(client, url)["title"] == "new"
+
+
+def test_reused_ids_are_not_served_stale(client, url_for):
+    todolist = TodoList(title="old").save()
+    url = url_for("api.get_todolist", todolist_id=todolist.id)
+    assert get_json(client, url)["title"] == "old"
+
+    # another process deletes the row, and a new one reuses its id
+    db.session.execute(delete(TodoList).where(TodoList.id == todolist.id))
+    db.session.execute(
+        insert(TodoList).values(
+            id=todolist.id, _title="new", updated_at=datetime.now(UTC)
+        )
+    )
+    db.session.commit()
+    db.session.remove()
+    assert get_json(client, url)["title"] == "new"
+
+    # as does a new row of this process
+    db.session.get(TodoList, todolist.id).delete()
+    assert TodoList(title="newer").save().id == todolist.id
+    assert get_json(client, url)["title"] == "newer"
+
+
+def test_cache_stats_count_lookups_of_all_threads(app):
+    def lookup():
+        with app.app_context():
+            for _ in range(1000):
+                resource_cache.get("todo", 1, 1)
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert resource_cache.stats()["misses"] == 8000
+
+
+def test_todo_changes_invalidate_todo_and_todolist(client, url_for):
+    todolist = TodoList(title="new todolist").save()
+    todo = Todo(description="first", todolist_id=todolist.id).save()
+    todolist_url = url_for("api.get_todolist", todolist_id=todolist.id)
+    todo_url = url_for("api.get_todo", todo_id=todo.id)
+    assert get_json(client, todolist_url)["open_todo_count"] == 1
+    assert get_json(client, todo_url)["status"] == "open"
+
+    todo.finished()
+    assert get_json(client, todolist_url)["finished_todo_count"] == 1
+    assert get_json(client, todo_url)["status"] == "finished"
+
+    todo.reopen()
+    assert get_json(client, todolist_url)["open_todo_count"] == 1
+    assert get_json(client, todo_url)["status"] == "open"
+
+    todo.delete()
+    assert get_json(client, todolist_url)["total_todo_count"] == 0
+
+
+def test_todolist_changes_invalidate_its_creator(client, url_for):
+    User(username="alice", email="alice@example.com", password=PASSWORD).save()
+    url = url_for("api.get_user", username="alice")
+    assert get_json(client, url)["todolist_count"] == 0
+
+    todolist = TodoList(title="new todolist", creator="alice").save()
+    assert get_json(client, url)["todolist_count"] == 1
+    assert get_json(client, url_for("api.get_users"))["users"][0]["todolist_count"] == 1
+
+    todolist.delete()
+    assert get_json(client, url)["todolist_count"] == 0
+
+
+def test_rollback_drops_uncommitted_representations(app):
+    todolist = TodoList(title="new todolist").save()
+    with pytest.raises(RuntimeError), app.test_request_context(), transaction():
+        todolist.title = "renamed"
+        todolist.save()
+        assert todolist.to_dict()["title"] == "renamed"
+        raise RuntimeError
+
+    with app.test_request_context():
+        assert todolist.to_dict()["title"] == "new todolist"
+
+
+def test_null_backend_caches_nothing(app, client, url_for):
+    app.config["RESOURCE_CACHE_BACKEND"] = "null"
+    resource_cache.init_app(app)
+    todolist = TodoList(title="new todolist").save()
+    url = url_for("api.get_todolist", todolist_id=todolist.id)
+
+    get_json(client, url)
+    get_json(client, url)
+    assert resource_cache.stats() == {
+        "hits": 0,
+        "misses": 2,
+        "evictions": 0,
+        "size": 0,
+    }
+
+
+def test_cache_stats_requires_admin(client, url_for):
+    response = client.get(url_for("api.get_cache_stats"))
+    assert response.status_code == 403
+
+    User(
+        username="admin", email="admin@example.com", password=PASSWORD, is_admin=True
+    ).save()
+    client.post(
+        url_for("auth.login"),
+        data={"email_or_username": "admin", "password": PASSWORD},
+    )
+    stats = get_json(client, url_for("api.get_cache_stats"))
+    assert set(stats) == {"hits", "misses", "evictions", "size"}
+
+
+def user_queries(queries):
+    return [query for query in queries if "FROM user" in query]
+
+
+def test_current_user_is_cached(app, queries):
+    user = User(username="alice", email="alice@example.com", password=PASSWORD).save()
+    user_id = str(user.id)
+
+    queries.clear()
+    for _ in range(2):
+        session_user = load_user(user_id)
+        assert session_user.username == "alice"
+        assert session_user.is_authenticated
+        assert not session_user.is_admin
+    assert len(user_queries(queries)) == 1
+
+
+def test_user_changes_invalidate_current_user(app):
+    user = User(username="alice", email="alice@example.com", password=PASSWORD).save()
+    assert not load_user(str(user.id)).is_admin
+
+    user.promote_to_admin()
+    assert load_user(str(user.id)).is_admin
+
+    user.delete()
+    assert load_user(str(user.id)) is None
+
+
+def test_session_user_cache_can_be_disabled(app, queries):
+    app.config["SESSION_USER_CACHE_TTL"] = 0
+    session_user_cache.init_app(app)
+    user = User(username="alice", email="alice@example.com", password=PASSWORD).save()
+    user_id = str(user.id)
+
+    queries.clear()
+    load_user(user_id)
+    load_user(user_id)
+    assert len(user_queries(queries)) == 2
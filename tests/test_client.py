@@ -1,4 +1,7 @@
-from app.models import User
+from sqlalchemy import event
+
+from app import db
+from app.models import TodoList, User
 
 USERNAME_ALICE = "alice"
 PASSWORD = "correcthorsebatterystaple"
@@ -129,3 +132,22 @@ def test_empty_todo_stays_on_todolist_view(client, url_for, templates):
         b"Todos should neither be empty nor be longer than 128 characters."
         in response.data
     )
+
+
+def test_new_todolist_commits_once(client, url_for):
+    commits = []
+    event.listen(db.session(), "after_commit", commits.append)
+    response = client.post(url_for("main.new_todolist"), data={"todo": "first todo"})
+    assert_redirect(response, "/todolist/1/")
+    assert len(commits) == 1
+    assert db.session.get(TodoList, 1).todo_count == 1
+
+
+def test_server_timing_header_of_page(app, client, url_for):
+    app.config["SERVER_TIMING"] = True
+    response = client.get(url_for("main.index"))
+    timings = dict(
+        metric.split(";")[:2]
+        for metric in response.headers["Server-Timing"].split(", ")
+    )
+    assert float(timings["template"].removeprefix("dur=")) > 0
@@ -0,0 +1,114 @@
+import sqlite3
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, select, text
+
+from app import create_app, db
+from app.database import PRIMARY_COOKIE, set_sqlite_pragmas
+from app.models import TodoList
+from config import WAL_PRAGMAS, Config, TestingConfig
+
+
+def test_sqlite_pragmas_are_set_on_connect(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    set_sqlite_pragmas(engine, WAL_PRAGMAS)
+
+    with engine.connect() as connection:
+        assert connection.scalar(text("PRAGMA journal_mode")) == "wal"
+        assert connection.scalar(text("PRAGMA synchronous")) == 1  # NORMAL
+        assert connection.scalar(text("PRAGMA busy_timeout")) == 5000
+        assert connection.scalar(text("PRAGMA temp_store")) == 2  # MEMORY
+    engine.dispose()
+
+
+def test_pool_options_for_server_databases():
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "postgresql://localhost/todolist"
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"pool_size": 3}
+    Config.init_app(app)
+    assert app.config["SQLALCHEMY_ENGINE_OPTIONS"] == {
+        "pool_size": 3,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+    }
+
+
+def test_no_pool_options_for_sqlite():
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///todolist.db"
+    Config.init_app(app)
+    assert "SQLALCHEMY_ENGINE_OPTIONS" not in app.config
+
+
+@pytest.fixture
+def replicated(monkeypatch, tmp_path):
+    """An app with a primary and a replica database, synced by sync()."""
+    primary, replica = tmp_path / "primary.db", tmp_path / "replica.db"
+    monkeypatch.setattr(
+        TestingConfig, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{primary}"
+    )
+    monkeypatch.setattr(
+        TestingConfig, "SQLALCHEMY_BINDS", {"replica": f"sqlite:///{replica}"}
+    )
+    monkeypatch.setattr(TestingConfig, "RESOURCE_CACHE_BACKEND", "null")
+    # the replica bind adds an (empty) metadata, keep it from other tests
+    monkeypatch.setattr(db, "metadatas", dict(db.metadatas))
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(db.engines["replica"])
+
+        def sync():
+            with sqlite3.connect(primary) as source, sqlite3.connect(replica) as target:
+                source.backup(target)
+
+        yield app, sync
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def add_todolist(title):
+    todolist_id = TodoList(title=title).save().id
+    # forget it, so reading it takes a query
+    db.session.remove()
+    return todolist_id
+
+
+def test_get_requests_read_from_replica(replicated):
+    app, sync = replicated
+    client = app.test_client()
+    todolist_id = add_todolist("new todolist")
+    url = f"/api/todolist/{todolist_id}/"
+
+    assert client.get(url).status_code == 404
+    sync()
+    assert client.get(url).status_code == 200
+
+
+def test_clients_stick_to_primary_after_writes(replicated):
+    app, sync = replicated
+    client = app.test_client()
+
+    response = client.post("/api/todolist/", json={"title": "new todolist"})
+    assert response.status_code == 201
+    assert PRIMARY_COOKIE in response.headers["Set-Cookie"]
+    url = f"/api/todolist/{db.session.scalar(select(TodoList.id))}/"
+    db.session.remove()
+
+    assert client.get(url).status_code == 200
+    assert app.test_client().get(url).status_code == 404
+
+
+def test_requests_read_their_own_writes(replicated):
+    app, sync = replicated
+    with app.test_request_context("/", method="GET"):
+        stmt = select(TodoList)
+        assert db.session.get_bind(clause=stmt) is db.engines["replica"]
+        TodoList(title="new todolist").save()
+        assert db.session.get_bind(clause=stmt) is db.engine
+    with app.test_request_context("/", method="POST"):
+        assert db.session.get_bind(clause=stmt) is db.engine
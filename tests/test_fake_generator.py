@@ -0,0 +1,52 @@
+from sqlalchemy import func, select
+
+from app import db
+from app.models import Todo, TodoList, User
+from utils.fake_generator import BulkFakeGenerator, FakeGenerator
+
+
+def count(model):
+    return db.session.execute(select(func.count()).select_from(model)).scalar_one()
+
+
+def test_fake_generator(app):
+    FakeGenerator().start(2)
+    assert (count(User), count(TodoList), count(Todo)) == (2, 8, 32)
+    assert TodoList.find_counter_drift() == []
+
+
+def test_bulk_fake_generator(app):
+    messages = []
+    BulkFakeGenerator(
+        50, 100, 2000, seed=1, chunk_size=64, echo=messages.append
+    ).start()
+
+    assert (count(User), count(TodoList), count(Todo)) == (50, 100, 2000)
+    assert TodoList.find_counter_drift() == []
+    assert "rows/s" in messages[-1]
+    user = db.session.execute(select(User).limit(1)).scalar_one()
+    assert user.verify_password("correcthorsebatterystaple")
+
+    # Zipf-sized lists: the first todolist is by far the largest one
+    first = db.session.get(TodoList, 1)
+    last = db.session.get(TodoList, 100)
+    assert first.todo_count > 10 * last.todo_count
+
+
+def test_bulk_fake_generator_power_users(app, capsys):
+    BulkFakeGenerator(
+        100, 1000, 10, seed=1, power_users=0.02, power_user_share=0.5
+    ).start()
+    assert "1000 rows into todolist" in capsys.readouterr().out
+    stmt = select(func.count(TodoList.id)).where(
+        TodoList.creator.in_(select(User.username).where(User.id <= 2))
+    )
+    assert db.session.execute(stmt).scalar_one() > 400
+
+
+def test_bulk_fake_generator_is_reproducible(app):
+    BulkFakeGenerator(5, 10, 100, seed=7, echo=lambda message: None).start()
+    first = db.session.execute(select(Todo.description, Todo.todolist_id)).all()
+    BulkFakeGenerator(5, 10, 100, seed=7, echo=lambda message: None).start()
+    second = db.session.execute(select(Todo.description, Todo.todolist_id)).all()
+    assert first == second
@@ -0,0 +1,35 @@
+import runpy
+from pathlib import Path
+from types import SimpleNamespace
+
+from app import db
+
+CONF = str(Path(__file__).parents[1] / "gunicorn.conf.py")
+
+
+def test_workers_from_environment(monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    monkeypatch.setenv("GUNICORN_THREADS", "4")
+    conf = runpy.run_path(CONF)
+    assert conf["workers"] == 3
+    assert conf["worker_class"] == "gthread"
+    assert conf["preload_app"]
+
+
+def test_workers_from_cpu_count(monkeypatch):
+    for name in ("WEB_CONCURRENCY", "GUNICORN_THREADS", "GUNICORN_WORKER_CLASS"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr("os.cpu_count", lambda: 4)
+    conf = runpy.run_path(CONF)
+    assert conf["workers"] == 9
+    assert conf["worker_class"] == "sync"
+
+
+def test_post_fork_disposes_preloaded_engines(app):
+    conf = runpy.run_path(CONF)
+    pool = db.engine.pool
+    server = SimpleNamespace(
+        cfg=SimpleNamespace(preload_app=True), app=SimpleNamespace(wsgi=lambda: app)
+    )
+    conf["post_fork"](server, None)
+    assert db.engine.pool is not pool
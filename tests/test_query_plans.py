@@ -0,0 +1,231 @@
+import re
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.models import Todo, TodoList, User
+
+PASSWORD = "correcthorsebatterystaple"
+FULL_SCAN = re.compile(r"^SCAN (user|todolist|todo)\b")
+
+
+def seed():
+    for username in ("admin", "alice", "bob"):
+        User(
+            username=username,
+            email=username + "@example.com",
+            password=PASSWORD,
+            is_admin=username == "admin",
+        ).save()
+    for index in range(6):
+        todolist = TodoList(f"todolist {index}", ("alice", "bob")[index % 2]).save()
+        TodoList(f"anonymous {index}").save()
+        for number in range(4):
+            todo = Todo(f"todo {number}", todolist.id, todolist.creator).save()
+            if number % 2:
+                todo.finished()
+
+
+def route_requests():
+    """(endpoint, method, view arguments, request options) of every route."""
+    alice_list = {"username": "alice", "todolist_id": 1}
+    return [
+        (
+            "auth.login",
+            "POST",
+            {},
+            {"data": {"email_or_username": "admin", "password": PASSWORD}},
+        ),
+        ("main.index", "GET", {}, {}),
+        ("main.todolist_overview", "GET", {}, {}),
+        ("main.todolist_overview", "POST", {}, {"data": {"title": "list"}}),
+        ("main.todolist", "GET", {"id": 1}, {}),
+        ("main.todolist", "POST", {"id": 1}, {"data": {"todo": "page todo"}}),
+        ("main.new_todolist", "POST", {}, {"data": {"todo": "new todo"}}),
+        ("main.add_todolist", "POST", {}, {"data": {"title": "new list"}}),
+        ("auth.register", "GET", {}, {}),
+        (
+            "auth.register",
+            "POST",
+            {},
+            {
+                "data": {
+                    "username": "carol",
+                    "email": "carol@example.com",
+                    "password": PASSWORD,
+                    "password_confirmation": PASSWORD,
+                }
+            },
+        ),
+        ("auth.login", "GET", {}, {}),
+        ("api.get_routes", "GET", {}, {}),
+        ("api.get_users", "GET", {}, {}),
+        ("api.get_users", "GET", {}, {"query_string": {"cursor": 1}}),
+        ("api.get_user", "GET", {"username": "alice"}, {}),
+        (
+            "api.add_user",
+            "POST",
+            {},
+            {
+                "json": {
+                    "username": "dave",
+                    "email": "dave@example.com",
+                    "password": PASSWORD,
+                }
+            },
+        ),
+        ("api.get_user_todolists", "GET", {"username": "alice"}, {}),
+        (
+            "api.get_user_todolists",
+            "GET",
+            {"username": "alice"},
+            {"query_string": {"cursor": 1}},
+        ),
+        ("api.get_user_todolist", "GET", alice_list, {}),
+        (
+            "api.import_user",
+            "POST",
+            {"username": "alice"},
+            {
+                "data": '{"id": 1, "title": "imported", "todos": [{"description": '
+                '"first"}]}\n{"type": "todo", "todolist_id": 1, "description": "b"}'
+            },
+        ),
+        ("api.export_user", "GET", {"username": "alice"}, {}),
+        (
+            "api.export_user",
+            "GET",
+            {"username": "alice"},
+            {"query_string": {"since": "2000-01-01T00:00:00+00:00"}},
+        ),
+        (
+            "api.add_user_todolist",
+            "POST",
+            {"username": "alice"},
+            {"json": {"title": "api list"}},
+        ),
+        ("api.get_todolists", "GET", {}, {}),
+        ("api.get_todolists", "GET", {}, {"query_string": {"cursor": 1}}),
+        ("api.get_todolist", "GET", {"todolist_id": 1}, {}),
+        ("api.add_todolist", "POST", {}, {"json": {"title": "api list"}}),
+        ("api.get_todolist_todos", "GET", {"todolist_id": 1}, {}),
+        (
+            "api.get_todolist_todos",
+            "GET",
+            {"todolist_id": 1},
+            {"query_string": {"cursor": 1}},
+        ),
+        ("api.get_user_todolist_todos", "GET", alice_list, {}),
+        (
+            "api.add_user_todolist_todo",
+            "POST",
+            alice_list,
+            {"json": {"description": "api todo"}},
+        ),
+        (
+            "api.add_todolist_todo",
+            "POST",
+            {"todolist_id": 1},
+            {"json": {"description": "api todo"}},
+        ),
+        (
+            "api.add_todolist_todo",
+            "POST",
+            {"todolist_id": 1},
+            {"json": [{"description": "first"}, {"description": "second"}]},
+        ),
+        ("api.get_todo", "GET", {"todo_id": 1}, {}),
+        ("api.update_todo_status", "PUT", {"todo_id": 1}, {"json": {"is_finished": 1}}),
+        (
+            "api.change_todolist_title",
+            "PUT",
+            {"todolist_id": 1},
+            {"json": {"title": "renamed"}},
+        ),
+        (
+            "api.update_todos",
+            "PUT",
+            {},
+            {"json": {"todo_ids": [1, 2], "is_finished": True}},
+        ),
+        (
+            "api.update_todolist_todos",
+            "PUT",
+            {"todolist_id": 1},
+            {"json": {"is_finished": False}},
+        ),
+        ("api.delete_todo", "DELETE", {"todo_id": 2}, {"json": {"todo_id": 2}}),
+        (
+            "api.delete_todolist",
+            "DELETE",
+            {"todolist_id": 2},
+            {"json": {"todolist_id": 2}},
+        ),
+        (
+            "api.delete_user",
+            "DELETE",
+            {"username": "dave"},
+            {"json": {"username": "dave"}},
+        ),
+        ("api.search_todos", "GET", {}, {"query_string": {"q": "api*"}}),
+        (
+            "api.search_todos",
+            "GET",
+            {},
+            {"query_string": {"q": "api*", "mine": 1, "cursor": "-1.0:1"}},
+        ),
+        ("api.get_cache_stats", "GET", {}, {}),
+        ("auth.logout", "GET", {}, {}),
+    ]
+
+
+def test_every_route_is_covered(app):
+    covered = {(endpoint, method) for endpoint, method, _, _ in route_requests()}
+    routes = {
+        (rule.endpoint, method)
+        for rule in app.url_map.iter_rules()
+        if rule.endpoint != "static"
+        for method in rule.methods or ()
+        if method not in {"HEAD", "OPTIONS"}
+    }
+    assert routes - covered == set()
+
+
+@pytest.fixture
+def statements(app):
+    recorded = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            recorded.append((statement, parameters))
+
+    seed()
+    event.listen(db.engine, "before_cursor_execute", record)
+    yield recorded
+    event.remove(db.engine, "before_cursor_execute", record)
+
+
+def explain(statement, parameters):
+    connection = db.session.connection()
+    rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+    return [row[3] for row in rows]
+
+
+def full_scans(statement, plan):
+    # a full scan is only fine on a page that stops after LIMIT rows
+    if re.search(r"\bLIMIT\b", statement) and not any("TEMP B-TREE" in d for d in plan):
+        return []
+    return [detail for detail in plan if FULL_SCAN.match(detail)]
+
+
+def test_routes_do_not_scan_whole_tables(client, url_for, statements):
+    for endpoint, method, view_args, options in route_requests():
+        statements.clear()
+        response = client.open(
+            url_for(endpoint, **view_args), method=method, buffered=True, **options
+        )
+        assert response.status_code < 400, (endpoint, method)
+        for statement, parameters in list(statements):
+            plan = explain(statement, parameters)
+            assert full_scans(statement, plan) == [], (endpoint, statement, plan)
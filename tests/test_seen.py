@@ -0,0 +1,81 @@
+import pytest
+
+from app import db, last_seen_buffer
+from app.models import User
+
+PASSWORD = "correcthorsebatterystaple"
+
+
+@pytest.fixture
+def buffered(app):
+    app.config["LAST_SEEN_FLUSH_INTERVAL"] = 60
+    last_seen_buffer.init_app(app)
+    yield
+    last_seen_buffer.flush()
+
+
+def add_user(username):
+    return User(
+        username=username, email=f"{username}@example.com", password=PASSWORD
+    ).save()
+
+
+def login(client, url_for, username):
+    return client.post(
+        url_for("auth.login"),
+        data={"email_or_username": username, "password": PASSWORD},
+    )
+
+
+def get_etag(client, url_for, username):
+    return client.get(url_for("api.get_user", username=username)).headers["ETag"]
+
+
+def test_login_does_not_write_last_seen(app, buffered, client, url_for, queries):
+    add_user("alice")
+    etag = get_etag(client, url_for, "alice")
+
+    queries.clear()
+    response = login(client, url_for, "alice")
+    assert response.status_code == 302
+    assert not [query for query in queries if query.startswith("UPDATE")]
+    assert get_etag(client, url_for, "alice") == etag
+
+    assert last_seen_buffer.flush() == 1
+    assert get_etag(client, url_for, "alice") != etag
+    assert db.session.get(User, 1).version == 2
+
+
+def test_flush_writes_all_users_at_once(app, buffered, queries):
+    users = [add_user(username) for username in ("alice", "bob")]
+    for user in users:
+        user.seen()
+    seen = {user.username: user.last_seen for user in users}
+
+    queries.clear()
+    assert last_seen_buffer.flush() == 2
+    assert len([query for query in queries if query.startswith("UPDATE")]) == 1
+    db.session.expire_all()
+    for user in User.query.all():
+        assert user.last_seen.replace(tzinfo=None) == seen[user.username].replace(
+            tzinfo=None
+        )
+    assert last_seen_buffer.flush() == 0
+
+
+def test_record_flushes_when_due(app, buffered, monkeypatch):
+    user = add_user("alice")
+    user.seen()
+    assert app.extensions["last_seen"].times
+
+    monkeypatch.setattr("app.seen.time.monotonic", lambda: float("inf"))
+    user.seen()
+    assert not app.extensions["last_seen"].times
+
+
+def test_write_through_without_interval(app):
+    user = add_user("alice")
+    version = user.version
+    user.seen()
+    assert not app.extensions["last_seen"].times
+    assert user.version == version + 1
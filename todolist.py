@@ -1,5 +1,6 @@
 import os
 
+import click
 from dotenv import load_dotenv
 
 from app import create_app
@@ -20,11 +21,174 @@ def test():
 
 
 @app.cli.command()
-def fill_db():
+@click.option("--users", default=10, help="Number of users.")
+@click.option("--todolists", type=int, help="Number of todolists (bulk only).")
+@click.option("--todos", type=int, help="Number of todos (bulk only).")
+@click.option("--bulk", is_flag=True, help="Use batched inserts for large datasets.")
+@click.option("--seed", type=int, help="Seed for reproducible data (bulk only).")
+@click.option(
+    "--zipf", default=1.1, help="Zipf exponent of the todolist sizes (bulk only)."
+)
+@click.option("--power-users", default=0.01, help="Share of power users (bulk only).")
+@click.option(
+    "--power-user-share",
+    default=0.5,
+    help="Share of todolists owned by power users (bulk only).",
+)
+@click.option("--chunk-size", default=10000, help="Rows per insert (bulk only).")
+def fill_db(
+    users, todolists, todos, bulk, seed, zipf, power_users, power_user_share, chunk_size
+):
     """Fills database with random data.
     By default 10 users, 40 todolists and 160 todos.
+    Use --bulk for load-test datasets with millions of rows.
     WARNING: will delete existing data. For testing purposes only.
     """
-    from utils.fake_generator import FakeGenerator
+    from utils.fake_generator import BulkFakeGenerator, FakeGenerator
 
-    FakeGenerator().start()  # side effect: deletes existing data
+    # side effect: deletes existing data
+    if not bulk:
+        FakeGenerator().start(users)
+        return
+    BulkFakeGenerator(
+        users,
+        todolists if todolists is not None else users * 4,
+        todos if todos is not None else users * 16,
+        seed=seed,
+        zipf_exponent=zipf,
+        power_users=power_users,
+        power_user_share=power_user_share,
+        chunk_size=chunk_size,
+        echo=click.echo,
+    ).start()
+
+
+@app.cli.command()
+@click.option("--repair", is_flag=True, help="Fix the counters that drifted.")
+def check_counters(repair):
+    """Checks the todolist open/finished counters against the todos."""
+    from app.models import TodoList
+
+    drift = TodoList.find_counter_drift()
+    for todolist_id, open_count, finished_count, actual_open, actual_finished in drift:
+        click.echo(
+            f"todolist {todolist_id}: open {open_count} (actual {actual_open}), "
+            f"finished {finished_count} (actual {actual_finished})"
+        )
+    if not drift:
+        click.echo("All todolist counters are consistent.")
+    elif repair:
+        click.echo(f"Repaired {TodoList.repair_counters()} todolist(s).")
+    else:
+        raise SystemExit(1)
+
+
+@app.cli.command()
+@click.option("--target-ms", default=250, help="Hashing time to aim for.")
+@click.option("--algorithm", type=click.Choice(["scrypt", "pbkdf2"]), default="scrypt")
+def calibrate_password_hash(target_ms, algorithm):
+    """Suggests a PASSWORD_HASH_METHOD hashing within target_ms on this host.
+    Hashes made with other parameters are upgraded on the next login.
+    """
+    from app.passwords import calibrate
+
+    method, seconds, timings = calibrate(target_ms / 1000, algorithm)
+    for candidate, elapsed in timings:
+        click.echo(f"{candidate}: {elapsed * 1000:.1f}ms")
+    click.echo(f"PASSWORD_HASH_METHOD={method}  # {seconds * 1000:.1f}ms")
+
+
+@app.cli.command()
+@click.argument("file", type=click.File("rb"))
+@click.option("--user", "username", required=True, help="Owner of the todolists.")
+@click.option("--chunk-size", type=int, help="Rows per insert.")
+def import_todolists(file, username, chunk_size):
+    """Imports todolists and todos from an NDJSON file ('-' for stdin).
+    Takes the format of /api/user/<username>/export/ or todolist lines with
+    nested todos, see app/api/importer.py.
+    """
+    from app.api.importer import Importer
+    from app.models import User
+
+    if User.query.filter_by(username=username).first() is None:
+        raise click.BadParameter(f"{username} does not exist", param_hint="--user")
+    report = Importer(username, chunk_size or app.config["IMPORT_CHUNK_SIZE"]).run(file)
+    for error in report["errors"]:
+        click.echo(f"line {error['line']}: {error['error']}", err=True)
+    click.echo(
+        f"Imported {report['todolists']} todolist(s) and {report['todos']} todo(s), "
+        f"{report['error_count']} error(s)."
+    )
+    if report["error_count"]:
+        raise SystemExit(1)
+
+
+@app.cli.command()
+@click.option(
+    "--scale",
+    "scales",
+    type=int,
+    multiple=True,
+    default=[10, 10000],
+    show_default=True,
+    help="Number of todos to seed, can be repeated.",
+)
+@click.option("--requests", default=100, help="Requests per route and scale.")
+@click.option("--output", type=click.Path(dir_okay=False), help="JSON results file.")
+@click.option(
+    "--compare",
+    "baseline",
+    type=click.Path(exists=True, dir_okay=False),
+    help="JSON results of an earlier run to compare against.",
+)
+@click.option("--threshold", default=0.2, help="Tolerated p95 growth, e.g. 0.2.")
+def benchmark(scales, requests, output, baseline, threshold):
+    """Benchmarks all routes at several dataset scales.
+    Runs against BENCHMARK_DATABASE_URL (default: todolist-benchmark.db).
+    WARNING: will delete existing data in that database.
+    """
+    from utils.benchmark import Benchmark, compare, dump, load
+
+    results = Benchmark(
+        create_app("benchmark"), scales, requests, echo=click.echo
+    ).run()
+    if output:
+        dump(results, output)
+    if baseline:
+        regressions = compare(load(baseline), results, threshold)
+        for (scale, method, endpoint), before, after in regressions:
+            click.echo(
+                f"regression at {scale} todos: {method} {endpoint} "
+                f"p95 {before:.2f}ms -> {after:.2f}ms"
+            )
+        if regressions:
+            raise SystemExit(1)
+
+
+@app.cli.command()
+@click.argument("base_url")
+@click.option(
+    "--path",
+    "paths",
+    multiple=True,
+    default=["/api/todolists/", "/api/users/"],
+    show_default=True,
+    help="Path to request, can be repeated.",
+)
+@click.option("--concurrency", default=32, help="Requests in flight at once.")
+@click.option("--requests", default=1000, help="Requests per path.")
+@click.option("--method", default="GET", help="HTTP method of all requests.")
+@click.option("--json", "body", help="JSON body of all requests.")
+@click.option("--output", type=click.Path(dir_okay=False), help="JSON results file.")
+def loadtest(base_url, paths, concurrency, requests, method, body, output):
+    """Measures throughput and latency of a running server under load,
+    e.g. to compare sync and threaded gunicorn workers.
+    """
+    from utils.benchmark import dump
+    from utils.loadtest import LoadTest
+
+    results = LoadTest(
+        base_url, paths, concurrency, requests, method, body, echo=click.echo
+    ).run()
+    if output:
+        dump(results, output)
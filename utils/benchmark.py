@@ -0,0 +1,395 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+from typing import Any
+
+import sqlalchemy
+from flask import url_for
+from sqlalchemy import event
+
+from app import db
+from app.models import Todo, TodoList, User
+from utils.fake_generator import BulkFakeGenerator
+
+PASSWORD = "correcthorsebatterystaple"
+ADMIN = "benchmark-admin"
+# a todolist with 100 todos, in the format of the export
+IMPORT = "\n".join(
+    [json.dumps({"type": "todolist", "id": 1, "title": "imported"})]
+    + [
+        json.dumps({"type": "todo", "todolist_id": 1, "description": f"todo {i}"})
+        for i in range(100)
+    ]
+)
+
+
+@dataclass
+class Route:
+    """A route to benchmark, request(i, data) builds the i-th request.
+
+    request returns the view arguments and the keyword arguments for
+    client.open. login logs the client in once, relogin before every request.
+    """
+
+    endpoint: str
+    method: str
+    request: Callable[[int, dict[str, Any]], tuple[dict[str, Any], dict[str, Any]]]
+    login: bool = False
+    relogin: bool = False
+
+
+@dataclass
+class Result:
+    scale: int
+    endpoint: str
+    method: str
+    requests: int
+    errors: int
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    queries: float
+    peak_memory_kb: float
+
+
+def get(**view_args):
+    return lambda i, data: (view_args, {})
+
+
+def routes():
+    """All API, page and auth routes, each request targets its own rows."""
+    return [
+        Route("api.get_routes", "GET", get()),
+        Route("api.get_users", "GET", get()),
+        Route("api.get_user", "GET", lambda i, d: ({"username": d["username"]}, {})),
+        Route(
+            "api.add_user",
+            "POST",
+            lambda i, d: (
+                {},
+                {
+                    "json": {
+                        "username": f"bench-user-{i}",
+                        "email": f"bench-user-{i}@example.com",
+                        "password": PASSWORD,
+                    }
+                },
+            ),
+        ),
+        Route(
+            "api.get_user_todolists",
+            "GET",
+            lambda i, d: ({"username": d["username"]}, {}),
+        ),
+        Route(
+            "api.export_user",
+            "GET",
+            lambda i, d: ({"username": d["username"]}, {}),
+        ),
+        Route(
+            "api.import_user",
+            "POST",
+            lambda i, d: (
+                {"username": d["username"]},
+                {"data": IMPORT},
+            ),
+        ),
+        Route(
+            "api.get_user_todolist",
+            "GET",
+            lambda i, d: ({"username": d["username"], "todolist_id": 1}, {}),
+        ),
+        Route(
+            "api.add_user_todolist",
+            "POST",
+            lambda i, d: ({"username": d["username"]}, {"json": {"title": "bench"}}),
+        ),
+        Route("api.get_todolists", "GET", get()),
+        Route("api.get_todolist", "GET", get(todolist_id=1)),
+        Route("api.add_todolist", "POST", lambda i, d: ({}, {"json": {"title": "b"}})),
+        Route("api.get_todolist_todos", "GET", get(todolist_id=1)),
+        Route(
+            "api.get_user_todolist_todos",
+            "GET",
+            lambda i, d: ({"username": d["username"], "todolist_id": 1}, {}),
+        ),
+        Route(
+            "api.add_user_todolist_todo",
+            "POST",
+            lambda i, d: (
+                {"username": d["username"], "todolist_id": 1},
+                {"json": {"description": "bench"}},
+            ),
+        ),
+        Route(
+            "api.add_todolist_todo",
+            "POST",
+            lambda i, d: ({"todolist_id": 1}, {"json": {"description": "bench"}}),
+        ),
+        Route("api.get_todo", "GET", get(todo_id=1)),
+        Route(
+            "api.update_todo_status",
+            "PUT",
+            lambda i, d: ({"todo_id": 1}, {"json": {"is_finished": i % 2 == 0}}),
+        ),
+        Route(
+            "api.change_todolist_title",
+            "PUT",
+            lambda i, d: ({"todolist_id": 1}, {"json": {"title": f"bench {i}"}}),
+        ),
+        Route(
+            "api.update_todos",
+            "PUT",
+            lambda i, d: (
+                {},
+                {"json": {"todo_ids": [1, 2, 3], "is_finished": i % 2 == 0}},
+            ),
+        ),
+        Route(
+            "api.update_todolist_todos",
+            "PUT",
+            lambda i, d: ({"todolist_id": 1}, {"json": {"is_finished": i % 2 == 0}}),
+        ),
+        Route(
+            "api.delete_todo",
+            "DELETE",
+            lambda i, d: (
+                {"todo_id": d["todos"][i]},
+                {"json": {"todo_id": d["todos"][i]}},
+            ),
+            login=True,
+        ),
+        Route(
+            "api.delete_todolist",
+            "DELETE",
+            lambda i, d: (
+                {"todolist_id": d["todolists"][i]},
+                {"json": {"todolist_id": d["todolists"][i]}},
+            ),
+            login=True,
+        ),
+        Route(
+            "api.delete_user",
+            "DELETE",
+            lambda i, d: (
+                {"username": f"bench-user-{i}"},
+                {"json": {"username": f"bench-user-{i}"}},
+            ),
+            login=True,
+        ),
+        Route(
+            "api.search_todos",
+            "GET",
+            lambda i, d: ({}, {"query_string": {"q": "dolor sit*"}}),
+        ),
+        Route("api.get_cache_stats", "GET", get(), login=True),
+        Route("main.index", "GET", get()),
+        Route("main.todolist_overview", "GET", get(), login=True),
+        Route(
+            "main.todolist_overview",
+            "POST",
+            lambda i, d: ({}, {"data": {"title": "bench"}}),
+            login=True,
+        ),
+        Route("main.todolist", "GET", get(id=1)),
+        Route(
+            "main.todolist",
+            "POST",
+            lambda i, d: ({"id": 1}, {"data": {"todo": "bench"}}),
+        ),
+        Route(
+            "main.new_todolist",
+            "POST",
+            lambda i, d: ({}, {"data": {"todo": "bench"}}),
+            login=True,
+        ),
+        Route(
+            "main.add_todolist",
+            "POST",
+            lambda i, d: ({}, {"data": {"title": "bench"}}),
+            login=True,
+        ),
+        Route("auth.register", "GET", get()),
+        Route(
+            "auth.register",
+            "POST",
+            lambda i, d: (
+                {},
+                {
+                    "data": {
+                        "username": f"bench_register_{i}",
+                        "email": f"bench_register_{i}@example.com",
+                        "password": PASSWORD,
+                        "password_confirmation": PASSWORD,
+                    }
+                },
+            ),
+        ),
+        Route("auth.login", "GET", get()),
+        Route(
+            "auth.login",
+            "POST",
+            lambda i, d: (
+                {},
+                {"data": {"email_or_username": ADMIN, "password": PASSWORD}},
+            ),
+        ),
+        Route("auth.logout", "GET", get(), relogin=True),
+    ]
+
+
+class Benchmark:
+    """Measures every route of the app at several dataset scales.
+
+    For each scale (number of todos) the database is seeded with the bulk
+    fake generator, then every route is requested through the test client.
+    Latency percentiles and queries per request are taken over all requests,
+    peak memory is traced during one extra request.
+    WARNING: will delete existing data of the app's database.
+    """
+
+    def __init__(self, app, scales, requests=100, seed=1, echo=print):
+        self.app = app
+        self.scales = scales
+        self.requests = requests
+        self.seed = seed
+        self.echo = echo
+        self.queries = 0
+
+    def count_query(self, *args):
+        self.queries += 1
+
+    def seed_data(self, scale):
+        users = max(1, scale // 16)
+        todolists = max(1, scale // 4)
+        BulkFakeGenerator(
+            users, todolists, scale, seed=self.seed, echo=lambda message: None
+        ).start()
+        User(
+            username=ADMIN,
+            email=ADMIN + "@example.com",
+            password=PASSWORD,
+            is_admin=True,
+        ).save()
+        # rows that are deleted by the benchmark, one per request
+        count = self.requests + 1
+        todolists = TodoList.insert_many([{"title": "bench"}] * count)
+        todos = Todo.insert_many(
+            [
+                {"description": "bench", "todolist_id": todolist.id}
+                for todolist in todolists
+            ]
+        )
+        return {
+            "username": db.session.get(TodoList, 1).creator,
+            "todolists": [todolist.id for todolist in todolists],
+            "todos": [todo.id for todo in todos],
+        }
+
+    def login(self, client):
+        with self.app.test_request_context():
+            url = url_for("auth.login")
+        client.post(url, data={"email_or_username": ADMIN, "password": PASSWORD})
+
+    def measure(self, scale, route, data):
+        client = self.app.test_client()
+        if route.login:
+            self.login(client)
+        latencies, queries, errors = [], 0, 0
+        for i in range(self.requests + 1):
+            view_args, options = route.request(i, data)
+            with self.app.test_request_context():
+                url = url_for(route.endpoint, **view_args)
+            if route.relogin:
+                self.login(client)
+            tracing = i == self.requests
+            if tracing:
+                tracemalloc.start()
+            self.queries = 0
+            started = time.perf_counter()
+            # buffered, so streamed responses are read to the end as well
+            response = client.open(url, method=route.method, buffered=True, **options)
+            elapsed = time.perf_counter() - started
+            if tracing:
+                peak_memory = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                break
+            latencies.append(elapsed * 1000)
+            queries += self.queries
+            errors += response.status_code >= 400
+        percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        return Result(
+            scale=scale,
+            endpoint=route.endpoint,
+            method=route.method,
+            requests=self.requests,
+            errors=errors,
+            mean_ms=round(statistics.fmean(latencies), 3),
+            p50_ms=round(percentiles[49], 3),
+            p95_ms=round(percentiles[94], 3),
+            p99_ms=round(percentiles[98], 3),
+            queries=round(queries / self.requests, 2),
+            peak_memory_kb=round(peak_memory / 1024, 1),
+        )
+
+    def run(self):
+        results = []
+        with self.app.app_context():
+            event.listen(db.engine, "before_cursor_execute", self.count_query)
+            try:
+                for scale in self.scales:
+                    self.echo(f"seeding {scale} todos")
+                    data = self.seed_data(scale)
+                    for route in routes():
+                        result = self.measure(scale, route, data)
+                        self.echo(
+                            f"{scale:>9} {route.method:<6} {route.endpoint:<28} "
+                            f"p50 {result.p50_ms:8.2f}ms p95 {result.p95_ms:8.2f}ms "
+                            f"p99 {result.p99_ms:8.2f}ms {result.queries:6.1f} queries"
+                        )
+                        results.append(result)
+            finally:
+                event.remove(db.engine, "before_cursor_execute", self.count_query)
+            database = db.engine.dialect.name
+        return {
+            "created_at": datetime.now(UTC).isoformat(),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "database": database,
+            "requests": self.requests,
+            "results": [asdict(result) for result in results],
+        }
+
+
+def compare(baseline, current, threshold=0.2):
+    """Returns (key, baseline p95, current p95) of all p95 regressions.
+
+    A regression is a p95 latency that grew by more than threshold.
+    """
+
+    def key(result):
+        return result["scale"], result["method"], result["endpoint"]
+
+    before = {key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = before.get(key(result))
+        if old and result["p95_ms"] > old["p95_ms"] * (1 + threshold):
+            regressions.append((key(result), old["p95_ms"], result["p95_ms"]))
+    return regressions
+
+
+def load(path):
+    with open(path) as results_file:
+        return json.load(results_file)
+
+
+def dump(results, path):
+    with open(path, "w") as results_file:
+        json.dump(results, results_file, indent=2)
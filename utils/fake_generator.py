@@ -1,11 +1,16 @@
 import random
-from datetime import UTC, datetime
+import time
+from array import array
+from datetime import UTC, datetime, timedelta
+from itertools import accumulate
 
 import forgery_py
-from sqlalchemy import select
+from flask import current_app
+from sqlalchemy import insert, select
 
 from app import db
-from app.models import Todo, TodoList, User
+from app.models import Todo, TodoList, User, transaction
+from app.passwords import hash_password
 
 
 class FakeGenerator:
@@ -62,4 +67,164 @@ class FakeGenerator:
         self.generate_fake_todo(count * 16)
 
     def start(self, count=10):
-        self.generate_fake_data(count)
+        with transaction():
+            self.generate_fake_data(count)
+
+
+class BulkFakeGenerator(FakeGenerator):
+    """Generates large, skewed datasets with batched Core inserts.
+
+    Rows are generated and inserted chunk by chunk, so memory use is bounded
+    by the chunk size plus a few bytes per todolist. The number of todos per
+    todolist follows a Zipf distribution, and a small share of power users
+    owns a large share of the todolists.
+    """
+
+    pool_size = 1000
+
+    def __init__(
+        self,
+        users,
+        todolists,
+        todos,
+        seed=None,
+        zipf_exponent=1.1,
+        power_users=0.01,
+        power_user_share=0.5,
+        chunk_size=10000,
+        echo=print,
+    ):
+        super().__init__()
+        self.users = users
+        self.todolists = todolists
+        self.todos = todos
+        self.zipf_exponent = zipf_exponent
+        self.power_users = max(1, int(users * power_users))
+        self.power_user_share = power_user_share
+        self.chunk_size = chunk_size
+        self.echo = echo
+        # forgery_py draws from the global random generator
+        random.seed(seed)
+        self.now = datetime.now(UTC).replace(tzinfo=None)
+        # not internet.user_name(), its name dictionary grows with every call
+        self.names = [
+            forgery_py.name.last_name().lower().replace(" ", "")
+            for _ in range(self.pool_size)
+        ]
+        self.titles = [
+            forgery_py.forgery.lorem_ipsum.title() for _ in range(self.pool_size)
+        ]
+        self.descriptions = [
+            forgery_py.forgery.lorem_ipsum.words(random.randint(2, 8))
+            for _ in range(self.pool_size)
+        ]
+
+    def username(self, index):
+        """Usernames are derived from the index, so they need not be stored."""
+        return f"{self.names[index % self.pool_size]}{index}"
+
+    def generate_fake_date(self):
+        return self.now - timedelta(seconds=random.randrange(365 * 24 * 3600))
+
+    def insert_chunks(self, table, count, generate_row):
+        """Inserts count rows made by generate_row(index) in chunks."""
+        started = time.perf_counter()
+        for offset in range(0, count, self.chunk_size):
+            rows = [
+                generate_row(index)
+                for index in range(offset, min(offset + self.chunk_size, count))
+            ]
+            # a fresh app context per chunk, so recorded queries don't pile up
+            with current_app.app_context():
+                db.session.execute(insert(table), rows)
+                db.session.commit()
+        elapsed = time.perf_counter() - started
+        self.echo(
+            f"{count} rows into {table.name} in {elapsed:.2f}s "
+            f"({count / max(elapsed, 1e-9):.0f} rows/s)"
+        )
+        return elapsed
+
+    def generate_fake_users(self, count):
+        # hashing is slow on purpose, so all users share the same password hash
+        password_hash = hash_password("correcthorsebatterystaple")
+
+        def generate_user(index):
+            username = self.username(index)
+            member_since = self.generate_fake_date()
+            return {
+                "id": index + 1,
+                "username": username,
+                "email": f"{username}@example.com",
+                "password_hash": password_hash,
+                "member_since": member_since,
+                "last_seen": member_since,
+                "is_admin": False,
+            }
+
+        return self.insert_chunks(User.__table__, count, generate_user)
+
+    def generate_fake_todolists(self, count):
+        # the creator of each todolist, todos are created by the same user
+        self.creators = array("l", [0]) * count
+
+        def generate_todolist(index):
+            if random.random() < self.power_user_share:
+                creator = random.randrange(self.power_users)
+            else:
+                creator = random.randrange(self.users)
+            self.creators[index] = creator
+            return {
+                "id": index + 1,
+                "title": random.choice(self.titles),
+                "creator": self.username(creator),
+                "created_at": self.generate_fake_date(),
+                "open_count": 0,
+                "finished_count": 0,
+            }
+
+        return self.insert_chunks(TodoList.__table__, count, generate_todolist)
+
+    def generate_fake_todo(self, count):
+        # todolist i + 1 has a weight of 1 / (i + 1)^s, i.e. Zipf-sized lists
+        cum_weights = array(
+            "d",
+            accumulate(
+                1 / rank**self.zipf_exponent for rank in range(1, self.todolists + 1)
+            ),
+        )
+
+        def generate_todo(index):
+            todolist = random.choices(range(self.todolists), cum_weights=cum_weights)[0]
+            created_at = self.generate_fake_date()
+            is_finished = random.random() < 0.5
+            return {
+                "id": index + 1,
+                "description": random.choice(self.descriptions),
+                "created_at": created_at,
+                "finished_at": (
+                    created_at + timedelta(hours=random.randrange(1, 72))
+                    if is_finished
+                    else None
+                ),
+                "is_finished": is_finished,
+                "creator": self.username(self.creators[todolist]),
+                "todolist_id": todolist + 1,
+            }
+
+        elapsed = self.insert_chunks(Todo.__table__, count, generate_todo)
+        started = time.perf_counter()
+        TodoList.repair_counters()
+        self.echo(f"counted todos in {time.perf_counter() - started:.2f}s")
+        return elapsed
+
+    def start(self):
+        started = time.perf_counter()
+        self.generate_fake_users(self.users)
+        self.generate_fake_todolists(self.todolists)
+        self.generate_fake_todo(self.todos)
+        elapsed = time.perf_counter() - started
+        rows = self.users + self.todolists + self.todos
+        self.echo(
+            f"{rows} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):.0f} rows/s)"
+        )
@@ -0,0 +1,100 @@
+import http.client
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+
+
+@dataclass
+class LoadResult:
+    method: str
+    path: str
+    concurrency: int
+    requests: int
+    errors: int
+    throughput: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+
+class LoadTest:
+    """Requests paths of a running server from concurrency threads at once.
+
+    Unlike Benchmark, which calls the app in process one request at a time,
+    this measures a deployment, e.g. sync against threaded gunicorn workers:
+    how many requests per second it serves and how long clients wait when
+    more requests are in flight than there are workers.
+    """
+
+    def __init__(
+        self,
+        base_url,
+        paths,
+        concurrency=32,
+        requests=1000,
+        method="GET",
+        body=None,
+        echo=print,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.paths = paths
+        self.concurrency = concurrency
+        self.requests = requests
+        self.method = method
+        self.body = body.encode() if body is not None else None
+        self.echo = echo
+
+    def request(self, url):
+        request = urllib.request.Request(url, data=self.body, method=self.method)
+        if self.body is not None:
+            request.add_header("Content-Type", "application/json")
+        started = time.perf_counter()
+        # urlopen raises HTTPError for error statuses. An overloaded server
+        # also drops or cuts off connections, raising e.g. RemoteDisconnected
+        # or IncompleteRead, which urllib does not wrap in URLError.
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+            failed = False
+        except OSError, http.client.HTTPException:
+            failed = True
+        return (time.perf_counter() - started) * 1000, failed
+
+    def measure(self, path):
+        url = self.base_url + path
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            started = time.perf_counter()
+            outcomes = list(pool.map(self.request, [url] * self.requests))
+            elapsed = time.perf_counter() - started
+        latencies = [latency for latency, _ in outcomes]
+        percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        return LoadResult(
+            method=self.method,
+            path=path,
+            concurrency=self.concurrency,
+            requests=self.requests,
+            errors=sum(failed for _, failed in outcomes),
+            throughput=round(self.requests / elapsed, 1),
+            p50_ms=round(percentiles[49], 3),
+            p95_ms=round(percentiles[94], 3),
+            p99_ms=round(percentiles[98], 3),
+        )
+
+    def run(self):
+        results = []
+        for path in self.paths:
+            result = self.measure(path)
+            self.echo(
+                f"{self.method:<6} {path:<40} {result.throughput:8.1f} req/s "
+                f"p50 {result.p50_ms:8.2f}ms p95 {result.p95_ms:8.2f}ms "
+                f"p99 {result.p99_ms:8.2f}ms {result.errors} errors"
+            )
+            results.append(result)
+        return {
+            "created_at": datetime.now(UTC).isoformat(),
+            "base_url": self.base_url,
+            "results": [asdict(result) for result in results],
+        }